@@ -0,0 +1,88 @@
+"""
+Frames to several consumers: one shared CameraService versus one capture each.
+
+Every consumer thread takes frames for a fixed time and touches each one
+like a cheap detector would. With the service the clip is decoded once
+and every consumer gets the same read-only array; without it each
+consumer opens its own cv2.VideoCapture, as every FaceDetector did. Also
+reports how long after capture a frame reaches its consumers.
+
+    python -m benchmark.camera_fanout --video clip.avi --consumers 1 2 4 8
+"""
+import argparse
+import statistics
+import threading
+import time
+import cv2
+from tool.camera_service import CameraService, SYNTHETIC
+
+def consume(take, seconds: float, latencies: list, counts: list):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        frame = take()
+        if frame is None:
+            continue
+        image, timestamp = frame
+        latencies.append(time.time() - timestamp)
+        image[::64, ::64].sum()  # read it, like a consumer would
+        n += 1
+    counts.append(n)
+
+def shared(source, consumers: int, seconds: float) -> tuple[float, float]:
+    service = CameraService(source, loop=True)
+    latencies, counts = [], []
+    subscriptions = [service.subscribe() for _ in range(consumers)]
+
+    def take(subscription):
+        frame = subscription.wait_frame(0.5)
+        return None if frame is None else (frame.image, frame.timestamp)
+
+    threads = [threading.Thread(target=consume, args=(lambda s=s: take(s), seconds, latencies, counts))
+               for s in subscriptions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for subscription in subscriptions:
+        subscription.close()
+    service.close()
+    return sum(counts) / seconds, 1000 * statistics.median(latencies)
+
+def separate(source, consumers: int, seconds: float) -> tuple[float, float]:
+    latencies, counts = [], []
+
+    def reader():
+        cap = cv2.VideoCapture(source)
+
+        def take():
+            success, image = cap.read()
+            if not success:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                return None
+            return image, time.time()
+
+        consume(take, seconds, latencies, counts)
+        cap.release()
+
+    threads = [threading.Thread(target=reader) for _ in range(consumers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, 1000 * statistics.median(latencies)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", default=SYNTHETIC)
+    parser.add_argument("--consumers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for consumers in args.consumers:
+        shared_fps, shared_ms = shared(args.video, consumers, args.seconds)
+        line = f"{consumers} consumers: shared {shared_fps:.0f} frames/s delivered, {shared_ms:.2f} ms after capture"
+        if args.video != SYNTHETIC:
+            separate_fps, _ = separate(args.video, consumers, args.seconds)
+            line += f"; separate captures {separate_fps:.0f} frames/s"
+        print(line)
@@ -0,0 +1,133 @@
+"""
+Load test for the /stream MJPEG endpoint.
+
+A server process runs the FastAPI app and publishes synthetic 640x480
+camera frames at 30 fps, like the controller does during alignment. The
+viewers are raw asyncio connections in this process; --slow of them read
+at a trickle to show that a slow viewer skips frames rather than making
+the server buffer them. Reports the server's CPU use, frames encoded
+versus delivered, and the quality level the stream settled on, read from
+/metrics. Linux only, server CPU is read from /proc.
+
+    python -m benchmark.camera_stream_load --clients 1 10 50 100 --slow 0.1
+"""
+import argparse
+import asyncio
+import re
+import subprocess
+import sys
+import threading
+import time
+from benchmark.status_stream_load import cpu_seconds
+
+BOUNDARY = b"--frame\r\n"
+
+def serve(port: int, fps: float):
+    """Server side, runs in the child process"""
+    import uvicorn
+    import website.web as web
+    from tool.camera_service import SyntheticCamera
+
+    def frames():
+        camera = SyntheticCamera(fps=fps)
+        while True:
+            _, frame = camera.read()
+            web.camera_stream.publish(frame)
+            time.sleep(1 / fps)
+
+    threading.Thread(target=frames, daemon=True).start()
+    uvicorn.run(web.app, host="127.0.0.1", port=port, log_level="warning")
+
+async def viewer(port: int, counts: list, index: int, slow: bool, stop: asyncio.Event):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /stream HTTP/1.1\r\nHost: bench\r\n\r\n")
+    await writer.drain()
+    tail = b""
+    try:
+        while not stop.is_set():
+            chunk = await reader.read(4096 if slow else 262144)
+            if not chunk:
+                break
+            data = tail + chunk
+            counts[index] += data.count(BOUNDARY)
+            tail = data[-len(BOUNDARY) + 1:]
+            if slow:
+                await asyncio.sleep(0.05)  # about 80 KB/s
+    finally:
+        writer.close()
+
+async def scrape(port: int) -> dict:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+    body = (await reader.read()).decode()
+    writer.close()
+    values = {}
+    for name in ("camera_stream_frames_encoded_total", "camera_stream_frames_dropped_total",
+                 "camera_stream_level"):
+        match = re.search(rf"^{name} (\S+)$", body, re.M)
+        values[name] = float(match.group(1)) if match else 0.0
+    return values
+
+async def run_load(port: int, clients: int, slow: float, duration: float, pid: int) -> dict:
+    stop = asyncio.Event()
+    counts = [0] * clients
+    slow_clients = set(range(int(round(clients * slow))))
+    tasks = []
+    for i in range(clients):
+        tasks.append(asyncio.create_task(viewer(port, counts, i, i in slow_clients, stop)))
+        await asyncio.sleep(0.002)
+
+    await asyncio.sleep(2)  # connect and let the level settle a little
+    before = await scrape(port)
+    start_counts = list(counts)
+    start_wall, start_cpu = time.perf_counter(), cpu_seconds(pid)
+    await asyncio.sleep(duration)
+    elapsed, cpu = time.perf_counter() - start_wall, cpu_seconds(pid) - start_cpu
+    after = await scrape(port)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    received = [counts[i] - start_counts[i] for i in range(clients)]
+    fast = [received[i] for i in range(clients) if i not in slow_clients]
+    slow_received = [received[i] for i in slow_clients]
+    encoded = after["camera_stream_frames_encoded_total"] - before["camera_stream_frames_encoded_total"]
+    return {
+        "clients": clients,
+        "server_cpu_percent": round(100 * cpu / elapsed, 1),
+        "encoded_fps": round(encoded / elapsed, 1),
+        "fast_viewer_fps": round(sum(fast) / len(fast) / elapsed, 1) if fast else None,
+        "slow_viewer_fps": round(sum(slow_received) / len(slow_received) / elapsed, 1) if slow_received else None,
+        "dropped": int(after["camera_stream_frames_dropped_total"] - before["camera_stream_frames_dropped_total"]),
+        "level": int(after["camera_stream_level"]),
+    }
+
+def measure(clients: int, slow: float, fps: float, duration: float, port: int) -> dict:
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmark.camera_stream_load", "--serve",
+        "--port", str(port), "--fps", str(fps),
+    ])
+    try:
+        time.sleep(4)  # import and bind
+        return asyncio.run(run_load(port, clients, slow, duration, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--slow", type=float, default=0.1, help="share of viewers reading slowly")
+    parser.add_argument("--fps", type=float, default=30.0, help="frames published per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.fps)
+    else:
+        for clients in args.clients:
+            result = measure(clients, args.slow, args.fps, args.duration, args.port)
+            print(", ".join(f"{key}: {value}" for key, value in result.items()))
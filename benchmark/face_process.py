@@ -0,0 +1,61 @@
+"""
+Main-process cost of FaceDetector versus ProcessFaceDetector.
+
+While a detector runs on a recorded clip, the main thread ticks a 10 ms
+timer the way the Tk loop does and pulls frames and vectors like
+MachineController.position(). Reports main-process CPU use and the
+jitter of the timer ticks for each variant.
+
+    python -m benchmark.face_process --video clip.mp4
+"""
+import argparse
+import resource
+import statistics
+import time
+from tool.face_detection import FaceDetector
+from tool.face_detection_process import ProcessFaceDetector
+
+def measure(detector_class, video, seconds: float = 10.0, tick: float = 0.01) -> dict:
+    detector = detector_class(display=True, camera_index=video)
+    time.sleep(2)  # model load and camera start are not what we measure
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_start = usage.ru_utime + usage.ru_stime
+    start = time.perf_counter()
+    late = []
+    frames = 0
+    next_tick = start + tick
+    while time.perf_counter() - start < seconds:
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+        late.append(time.perf_counter() - next_tick)
+        next_tick += tick
+        detector.get_vector()
+        if detector.get_frame() is not None:
+            frames += 1
+    elapsed = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = usage.ru_utime + usage.ru_stime - cpu_start
+    stats = detector.get_stats()
+    detector.stop()
+
+    late.sort()
+    return {
+        "main_cpu_percent": 100 * cpu / elapsed,
+        "tick_jitter_ms_median": 1000 * statistics.median(late),
+        "tick_jitter_ms_p99": 1000 * late[int(len(late) * 0.99)],
+        "frames_received": frames,
+        "detector_fps": stats.get("fps"),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", required=True, help="recorded clip, or a camera index")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    video = int(args.video) if args.video.isdigit() else args.video
+
+    for detector_class in (FaceDetector, ProcessFaceDetector):
+        result = measure(detector_class, video, args.seconds)
+        print(detector_class.__name__)
+        for key, value in result.items():
+            print(f"  {key}: {value}")
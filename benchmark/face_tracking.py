@@ -0,0 +1,78 @@
+"""
+Compare FaceDetector full-frame detection with ROI tracking mode.
+
+Every frame of a recorded clip goes through both detectors. Reports
+frames per second of each mode and how far (in pixels) the tracked nose
+tip lands from the full-frame one.
+
+    python -m benchmark.face_tracking --video clip.mp4
+"""
+import argparse
+import math
+import time
+import cv2
+from tool.face_detection import FaceDetector
+
+def offline_detector(video, **kwargs) -> FaceDetector:
+    """FaceDetector whose threads are stopped, so frames can be fed by hand"""
+    detector = FaceDetector(camera_index=video, **kwargs)
+    detector.set_running(False)
+    detector._thread.join()
+    return detector
+
+def read_frames(video, limit: int) -> list:
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < limit:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def run(detector: FaceDetector, frames: list, fps: float = 30.0) -> tuple[float, list]:
+    """Detections per second and raw nose tips, through _track() so tracking keeps its ROI"""
+    points = []
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        points.append(detector._track(frame, i / fps)[0])
+    return len(frames) / (time.perf_counter() - start), points
+
+def compare(video, frames: int = 300, detect_scale: float = 0.5, roi_size: float = 0.5,
+            redetect_interval: int = 30) -> dict:
+    clip = read_frames(video, frames)
+    if not clip:
+        raise ValueError(f"No frames in {video}")
+
+    full = offline_detector(video)
+    tracked = offline_detector(video, tracking=True, detect_scale=detect_scale,
+                               roi_size=roi_size, redetect_interval=redetect_interval)
+    full_fps, full_points = run(full, clip)
+    tracked_fps, tracked_points = run(tracked, clip)
+    full.face_detection.close()
+    tracked.face_detection.close()
+
+    errors = [math.dist(a, b) for a, b in zip(full_points, tracked_points) if a and b]
+    misses = sum(1 for a, b in zip(full_points, tracked_points) if a and not b)
+    return {
+        "frames": len(clip),
+        "full_fps": full_fps,
+        "tracking_fps": tracked_fps,
+        "mean_error_px": sum(errors) / len(errors) if errors else None,
+        "max_error_px": max(errors) if errors else None,
+        "tracking_misses": misses,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", required=True, help="recorded clip with a face in it")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--detect-scale", type=float, default=0.5)
+    parser.add_argument("--roi-size", type=float, default=0.5)
+    parser.add_argument("--redetect-interval", type=int, default=30)
+    args = parser.parse_args()
+
+    result = compare(args.video, args.frames, args.detect_scale, args.roi_size, args.redetect_interval)
+    for key, value in result.items():
+        print(f"{key}: {value}")
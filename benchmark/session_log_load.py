@@ -0,0 +1,76 @@
+"""
+Load test for the SQLite session log.
+
+Fills a fresh database with sessions of realistic length through the
+normal SessionLog writer, then times the queries the web endpoints run:
+the newest page of sessions, a page deep in the history, and the first
+and last page of an old session's timeline. With every query on a key
+range the timings should stay flat as the event count grows.
+
+    python -m benchmark.session_log_load --events 1000000 5000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from website.session_log import SessionLog
+
+# Roughly one protocol run: steps, cycles, shocks and ventilations
+EVENTS_PER_SESSION = 500
+
+def fill(log: SessionLog, events: int) -> tuple[list, float, list]:
+    sessions = []
+    puts = []
+    start = time.perf_counter()
+    for _ in range(events // EVENTS_PER_SESSION):
+        session_id = log.start_session()
+        sessions.append(session_id)
+        for i in range(EVENTS_PER_SESSION):
+            t = time.perf_counter()
+            log.event(session_id, "step", i % 14 + 1)
+            puts.append(time.perf_counter() - t)
+        log.end_session(session_id)
+    log.flush(timeout=600)
+    elapsed = time.perf_counter() - start
+    return sessions, elapsed, sorted(puts)
+
+def timed(fn, repeat: int = 50) -> float:
+    """Median milliseconds per call"""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return round(1000 * sorted(times)[len(times) // 2], 3)
+
+def measure(events: int, directory: str) -> dict:
+    path = os.path.join(directory, f"sessions-{events}.db")
+    log = SessionLog(path)
+    sessions, elapsed, puts = fill(log, events)
+    old = sessions[len(sessions) // 10]
+    result = {
+        "events": events,
+        "sessions": len(sessions),
+        "insert_per_s": int(events / elapsed),
+        # The producer competes with the writer for the GIL in this tight loop
+        "event_put_us_p99": round(1e6 * puts[len(puts) * 99 // 100], 1),
+        "event_put_us_max": round(1e6 * puts[-1], 1),
+        "list_newest_ms": timed(lambda: log.list_sessions(50)),
+        "list_deep_ms": timed(lambda: log.list_sessions(50, before=old)),
+        "timeline_first_ms": timed(lambda: log.timeline(old, 0, 1000)),
+        "timeline_tail_ms": timed(lambda: log.timeline(old, EVENTS_PER_SESSION - 100, 1000)),
+        "db_mb": round(os.path.getsize(path) / 1e6, 1),
+    }
+    log.close()
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, nargs="+", default=[100000, 1000000, 3000000])
+    parser.add_argument("--dir", default=None, help="where to put the databases, default a temp dir")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for events in args.events:
+            result = measure(events, directory)
+            print(", ".join(f"{key}: {value}" for key, value in result.items()))
@@ -0,0 +1,70 @@
+"""
+Throughput of PointStabilizer against BatchPointStabilizer.
+
+For each point count a random-walk track is filtered three ways: one
+scalar PointStabilizer per point, BatchPointStabilizer.stabilize once
+per frame (the live path), and BatchPointStabilizer.stabilize_track over
+the whole track (offline replay). Also checks that truncate=True gives
+exactly the scalar results.
+
+    python -m benchmark.stabilizer_batch --points 1 6 100 --frames 5000
+"""
+import argparse
+import time
+import numpy as np
+from tool.point_stabilizer import PointStabilizer, BatchPointStabilizer
+
+def random_track(frames: int, points: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 20, (frames, points, 2))
+    return np.trunc(np.cumsum(steps, axis=0) + 300)
+
+def scalar(track: np.ndarray) -> tuple[float, np.ndarray]:
+    frames, points, _ = track.shape
+    stabilizers = [PointStabilizer() for _ in range(points)]
+    rows = [[tuple(int(v) for v in p) for p in frame] for frame in track]
+    out = []
+    start = time.perf_counter()
+    for frame in rows:
+        out.append([s.stabilize(p) for s, p in zip(stabilizers, frame)])
+    return time.perf_counter() - start, np.array(out, dtype=float)
+
+def batch(track: np.ndarray, truncate: bool = False) -> float:
+    stabilizer = BatchPointStabilizer(track.shape[1], truncate=truncate)
+    start = time.perf_counter()
+    for frame in track:
+        stabilizer.stabilize(frame)
+    return time.perf_counter() - start
+
+def offline(track: np.ndarray, truncate: bool = False) -> tuple[float, np.ndarray]:
+    stabilizer = BatchPointStabilizer(track.shape[1], truncate=truncate)
+    start = time.perf_counter()
+    out = stabilizer.stabilize_track(track)
+    return time.perf_counter() - start, out
+
+def measure(points: int, frames: int) -> dict:
+    track = random_track(frames, points)
+    total = frames * points
+    scalar_t, scalar_out = scalar(track)
+    batch_t = batch(track)
+    offline_t, _ = offline(track)
+    _, truncated = offline(track, truncate=True)
+    return {
+        "points": points,
+        "scalar_points_per_s": int(total / scalar_t),
+        "batch_points_per_s": int(total / batch_t),
+        "track_points_per_s": int(total / offline_t),
+        "batch_speedup": round(scalar_t / batch_t, 2),
+        "track_speedup": round(scalar_t / offline_t, 2),
+        "truncate_matches_scalar": bool(np.array_equal(truncated, scalar_out)),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[1, 6, 100])
+    parser.add_argument("--frames", type=int, default=5000)
+    args = parser.parse_args()
+
+    for points in args.points:
+        result = measure(points, args.frames)
+        print(", ".join(f"{key}: {value}" for key, value in result.items()))
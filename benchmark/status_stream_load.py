@@ -0,0 +1,146 @@
+"""
+Load test for the /events status stream.
+
+For each viewer count, a server process runs the FastAPI app and bumps
+the CPR cycle counter at a fixed rate once every viewer is connected.
+The viewers are raw asyncio connections in this process. Reports the
+server's CPU use while publishing and how far apart viewers receive the
+same change. --poll instead has every viewer poll /record once a second,
+like the old dashboard, for comparison. Linux only, server CPU is read
+from /proc.
+
+    python -m benchmark.status_stream_load --clients 1 100 500 [--poll]
+"""
+import argparse
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+CYCLES = re.compile(rb'"cpr_cycles": (\d+)')
+
+def serve(port: int, clients: int, rate: float, duration: float, poll: bool = False):
+    """Server side, runs in the child process"""
+    import uvicorn
+    import website.web as web
+
+    def update():
+        if poll:
+            time.sleep(clients * 0.002 + 1)
+        else:
+            while web.status_stream.subscriber_count() < clients:
+                time.sleep(0.05)
+        time.sleep(0.5)
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            web.machine_status.update_status(cpr_cycles=1)
+            time.sleep(1 / rate)
+
+    threading.Thread(target=update, daemon=True).start()
+    uvicorn.run(web.app, host="127.0.0.1", port=port, log_level="warning")
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+async def viewer(port: int, received: list, first: asyncio.Event, stop: asyncio.Event):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    try:
+        while not stop.is_set():
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            now = time.perf_counter()
+            for match in CYCLES.finditer(chunk):
+                value = int(match.group(1))
+                if value > 0:
+                    received.append((value, now))
+                    first.set()
+    finally:
+        writer.close()
+
+async def poller(port: int, received: list, first: asyncio.Event, stop: asyncio.Event):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while not stop.is_set():
+            writer.write(b"GET /record HTTP/1.1\r\nHost: bench\r\n\r\n")
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(re.search(rb"content-length: (\d+)", head, re.I).group(1))
+            body = await reader.readexactly(length)
+            match = CYCLES.search(body.replace(b'":', b'": '))
+            if match and int(match.group(1)) > 0:
+                received.append((int(match.group(1)), time.perf_counter()))
+                first.set()
+            await asyncio.sleep(1)
+    finally:
+        writer.close()
+
+async def run_load(port: int, clients: int, rate: float, duration: float, pid: int, poll: bool = False) -> dict:
+    received = []
+    first = asyncio.Event()
+    stop = asyncio.Event()
+    tasks = []
+    for _ in range(clients):
+        client = poller if poll else viewer
+        tasks.append(asyncio.create_task(client(port, received, first, stop)))
+        await asyncio.sleep(0.002)
+
+    await asyncio.wait_for(first.wait(), timeout=60)
+    start_wall, start_cpu = time.perf_counter(), cpu_seconds(pid)
+    await asyncio.sleep(duration)
+    elapsed, cpu = time.perf_counter() - start_wall, cpu_seconds(pid) - start_cpu
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Latency from the first viewer to see a value to the last one
+    first_seen, last_seen = {}, {}
+    for value, t in received:
+        first_seen[value] = min(first_seen.get(value, t), t)
+        last_seen[value] = max(last_seen.get(value, t), t)
+    spread = sorted(last_seen[v] - first_seen[v] for v in first_seen)
+    return {
+        "clients": clients,
+        "server_cpu_percent": 100 * cpu / elapsed,
+        "messages_received": len(received),
+        "fanout_spread_ms_median": 1000 * spread[len(spread) // 2] if spread else None,
+        "fanout_spread_ms_max": 1000 * spread[-1] if spread else None,
+    }
+
+def measure(clients: int, rate: float, duration: float, port: int, poll: bool = False) -> dict:
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmark.status_stream_load", "--serve",
+        "--port", str(port), "--clients", str(clients),
+        "--rate", str(rate), "--duration", str(duration),
+    ] + (["--poll"] if poll else []))
+    try:
+        time.sleep(3)  # import and bind
+        return asyncio.run(run_load(port, clients, rate, duration, server.pid, poll))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 100, 300, 500])
+    parser.add_argument("--rate", type=float, default=5.0, help="status changes per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--poll", action="store_true", help="poll /record instead of streaming")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.clients[0], args.rate, args.duration, args.poll)
+    else:
+        for clients in args.clients:
+            result = measure(clients, args.rate, args.duration, args.port, args.poll)
+            print(", ".join(f"{key}: {value}" for key, value in result.items()))
@@ -0,0 +1,338 @@
+"""
+Headless benchmark suite for start-up, the stabilizer, detector, rendering and web paths.
+
+Each case reports a few metrics tagged with whether higher or lower is
+better. Results are written as JSON; with --baseline a previous result
+file is compared metric by metric and the run exits with status 1 when
+any metric got worse by more than --tolerance.
+
+    python -m benchmark.suite --output results.json
+    python -m benchmark.suite --baseline results.json --only stabilizer slides
+    python -m benchmark.suite --video clip.mp4
+
+Without --video a synthetic clip is generated, which has no face in it,
+so detector numbers then measure the no-face path.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HIGHER = "higher"
+LOWER = "lower"
+
+def metric(value: float, unit: str, better: str = HIGHER) -> dict:
+    return {"value": value, "unit": unit, "better": better}
+
+def median_of(repeat: int, fn) -> dict:
+    """Run a case repeat times and keep the median of every metric"""
+    runs = [fn() for _ in range(repeat)]
+    result = {}
+    for name, first in runs[0].items():
+        result[name] = dict(first, value=statistics.median(run[name]["value"] for run in runs))
+    return result
+
+def synthetic_clip(path: str, frames: int = 150, size=(640, 480), fps: float = 30.0) -> str:
+    """Write a clip with a moving blob, for when no recording is at hand"""
+    import cv2
+    import numpy as np
+
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    rng = np.random.default_rng(1)
+    background = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = background.copy()
+        x = int(w / 2 + w / 4 * np.sin(i / 15))
+        cv2.ellipse(frame, (x, h // 2), (60, 80), 0, 0, 360, (140, 170, 210), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+def bench_stabilizer(args) -> dict:
+    from tool.point_stabilizer import PointStabilizer
+
+    rng = random.Random(1)
+    x, y = 320.0, 240.0
+    track = []
+    for _ in range(args.points):
+        x += rng.gauss(0, 8)
+        y += rng.gauss(0, 8)
+        track.append((int(x), int(y)))
+
+    def run():
+        stabilizer = PointStabilizer()
+        start = time.perf_counter()
+        for point in track:
+            stabilizer.stabilize(point)
+        elapsed = time.perf_counter() - start
+        return {
+            "points_per_s": metric(len(track) / elapsed, "points/s"),
+            "us_per_point": metric(1e6 * elapsed / len(track), "us", LOWER),
+        }
+
+    def run_batch():
+        from benchmark.stabilizer_batch import random_track, batch, offline
+
+        result = {}
+        for points in (6, 100):
+            track = random_track(max(1, args.points // points), points)
+            result[f"batch{points}_points_per_s"] = metric(track.size / 2 / batch(track), "points/s")
+            result[f"track{points}_points_per_s"] = metric(track.size / 2 / offline(track)[0], "points/s")
+        return result
+
+    return dict(median_of(args.repeat, run), **median_of(args.repeat, run_batch))
+
+def bench_detector(args) -> dict:
+    from benchmark.face_tracking import offline_detector, read_frames, run
+    from tool.face_detection import FaceDetector
+
+    clip = read_frames(args.video, 300)
+    detector = offline_detector(args.video)
+    fps = median_of(args.repeat, lambda: {"detect_fps": metric(run(detector, clip)[0], "fps")})
+    detector.face_detection.close()
+
+    # The clip as a camera: the capture thread reads it as fast as it decodes,
+    # so the pipeline runs at the detector's pace and drops what it can't use
+    live = FaceDetector(camera_index=args.video)
+    time.sleep(args.detector_seconds)
+    stats = live.get_stats()
+    live.stop()
+    return dict(
+        fps,
+        pipeline_fps=metric(stats["fps"], "fps"),
+        capture_to_vector_ms=metric(stats["latency_ms"], "ms", LOWER),
+    )
+
+def bench_slides(args) -> dict:
+    from interface.slide_cache import SlideCache
+
+    cache = SlideCache()
+    slides = [i for i in range(1, 15) if os.path.exists(cache.path(i))]
+    if not slides:
+        raise FileNotFoundError("No slides under ./resources, run from the repository root")
+    w, h = args.screen
+
+    def run():
+        start = time.perf_counter()
+        for slide_id in slides:
+            cache._load(slide_id, *cache.fit(slide_id, w, h))
+        return {"slide_load_ms": metric(1000 * (time.perf_counter() - start) / len(slides), "ms", LOWER)}
+
+    return median_of(args.repeat, run)
+
+def bench_preview(args) -> dict:
+    import numpy as np
+    from interface.preview import PreviewRenderer
+    from interface.slide_cache import fit_size
+
+    frame = np.random.default_rng(1).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    renderer = PreviewRenderer(canvas=None)
+    size = fit_size(640, 480, *args.screen)
+
+    photo = None
+    try:
+        import tkinter as tk
+        from PIL import ImageTk
+        root = tk.Tk()
+        root.withdraw()
+        photo = ImageTk.PhotoImage("RGB", size)
+    except Exception:  # no display, measure the scaling path alone
+        pass
+
+    # Separate names so a run with Tk is never compared with one without
+    name = "preview_frame_ms" if photo is None else "preview_frame_tk_ms"
+
+    def run(frames=200):
+        start = time.perf_counter()
+        for _ in range(frames):
+            image = renderer.convert(frame, *size)
+            if photo is not None:
+                photo.paste(image)
+        return {name: metric(1000 * (time.perf_counter() - start) / frames, "ms", LOWER)}
+
+    return median_of(args.repeat, run)
+
+def bench_startup(args) -> dict:
+    """Import times in fresh interpreters: what run.py loads before the window, and the warm-up"""
+    code = (
+        "import json, time\n"
+        "from tool.startup import startup\n"
+        "import run\n"
+        "t = startup.elapsed()\n"
+        "for name in ('pygame', 'tool.sound_tool', 'machine.controller', 'tool.face_detection'):\n"
+        "    startup.timed_import(name)\n"
+        "import tool.face_detection as fd\n"
+        "warm = fd.warm_up()\n"
+        "print(json.dumps({'run': t, 'warm_up': warm, **startup.report()['imports']}))\n"
+    )
+
+    def run():
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        times = json.loads(out.stdout.strip().splitlines()[-1])
+        warm_up = sum(v for k, v in times.items() if k != "run")
+        return {
+            "import_to_window_ms": metric(1000 * times["run"], "ms", LOWER),
+            "warm_up_ms": metric(1000 * warm_up, "ms", LOWER),
+        }
+
+    return median_of(args.repeat, run)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def hammer(port: int, seconds: float, clients: int, etag: str = None) -> int:
+    request = b"GET /record HTTP/1.1\r\nHost: bench\r\n"
+    if etag:
+        request += b"If-None-Match: " + etag.encode() + b"\r\n"
+    request += b"\r\n"
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal done
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < deadline:
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+                match = re.search(rb"content-length: (\d+)", head, re.I)
+                if match:
+                    await reader.readexactly(int(match.group(1)))
+                done += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return done
+
+def bench_web(args) -> dict:
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "website.web:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ])
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+
+        async def measure():
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /record HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+            head = await reader.readuntil(b"\r\n\r\n")
+            writer.close()
+            etag = re.search(rb'etag: ("[^"]+")', head, re.I).group(1).decode()
+            full = await hammer(port, args.web_seconds, args.clients)
+            cached = await hammer(port, args.web_seconds, args.clients, etag)
+            return full, cached
+
+        full, cached = asyncio.run(measure())
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "record_rps": metric(full / args.web_seconds, "req/s"),
+        "record_304_rps": metric(cached / args.web_seconds, "req/s"),
+    }
+
+CASES = {
+    "startup": bench_startup,
+    "stabilizer": bench_stabilizer,
+    "detector": bench_detector,
+    "slides": bench_slides,
+    "preview": bench_preview,
+    "web": bench_web,
+}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """(case, metric, baseline, current, change) for every metric that got worse"""
+    regressions = []
+    for case, metrics in results.items():
+        for name, current in metrics.items():
+            old = baseline.get(case, {}).get(name)
+            if old is None or not old["value"]:
+                continue
+            change = (current["value"] - old["value"]) / abs(old["value"])
+            worse = -change if current["better"] == HIGHER else change
+            status = "REGRESSION" if worse > tolerance else "ok"
+            print(f"{case}.{name}: {old['value']:.4g} -> {current['value']:.4g} "
+                  f"{current['unit']} ({100 * change:+.1f}%) {status}")
+            if worse > tolerance:
+                regressions.append((case, name, old["value"], current["value"], change))
+    return regressions
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown, 0.10 is 10%%")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--video", default=None, help="recorded clip for the detector case")
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--screen", type=int, nargs=2, default=(1024, 600), metavar=("W", "H"))
+    parser.add_argument("--detector-seconds", type=float, default=10.0)
+    parser.add_argument("--web-seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if "detector" in args.only and args.video is None:
+            args.video = synthetic_clip(os.path.join(directory, "synthetic.avi"))
+
+        results = {}
+        for case in args.only:
+            print(f"Running {case}")
+            results[case] = CASES[case](args)
+            for name, value in results[case].items():
+                print(f"  {name}: {value['value']:.4g} {value['unit']}")
+
+    report = {
+        "meta": {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "video": args.video if args.video and os.path.exists(args.video) else "synthetic",
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {100 * args.tolerance:.0f}%")
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,163 @@
+import os
+import time
+import threading
+import tkinter as tk
+from collections import deque
+from tool.metrics import registry
+from tool.trace import tracer
+
+DISPATCH_LAG_SECONDS = registry.histogram(
+    "ui_dispatch_lag_seconds", "ui_queue put to handled on the Tk thread")
+DEPTH = registry.histogram(
+    "ui_queue_depth", "Messages waiting when the Tk loop wakes up",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+class UiDispatcher:
+    """
+    Thread-safe replacement for the ui_queue that wakes the Tk loop at once.
+
+    Producers call put() from any thread. Messages are handled in FIFO
+    order, except that only the newest preview frame is kept, at the place
+    it was put; so a slide put after a frame still covers it. Waking goes
+    through a pipe watched by Tk's file handler, so put() never calls into
+    Tk from a foreign thread.
+    """
+
+    preview_commands = ('update_cv_image',)
+
+    def __init__(self, root: tk.Tk, handlers: dict, latency_window: int = 256):
+        self.root = root
+        self.handlers = handlers  # command -> fn(*message[1:])
+
+        self._lock = threading.Lock()
+        self._controls = deque()  # (message, put time, trace flow id)
+        self._preview = None  # (message, put time, trace flow id) of the newest frame
+        self._preview_at = 0  # control messages put before it
+        self._wake_pending = False
+        self._closed = False
+
+        # Statistics, see get_stats()
+        self.dispatched = 0
+        self.frames_dropped = 0
+        self.unknown = 0
+        self.max_depth = 0
+        self._latencies = deque(maxlen=latency_window)
+
+        self.log_prefix = "Ui: "
+
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+        try:
+            root.tk.createfilehandler(self._read_fd, tk.READABLE, self._on_wake)
+            self._polling = False
+        except (AttributeError, tk.TclError):  # no file handlers, e.g. on Windows
+            self._polling = True
+            self._poll()
+
+    def put(self, message, block=True, timeout=None):
+        """Queue a message, same signature as queue.Queue.put"""
+        # The flow arrow leads from the producer's span to the handler's
+        entry = (message, time.perf_counter(), tracer.flow_start(message[0], "ui_queue"))
+        with self._lock:
+            if self._closed:  # producers may outlive the UI
+                return
+            if message[0] in self.preview_commands:
+                if self._preview is not None:
+                    self.frames_dropped += 1
+                self._preview = entry
+                self._preview_at = len(self._controls)
+            else:
+                self._controls.append(entry)
+            self.max_depth = max(self.max_depth, self._depth())
+            wake = not self._wake_pending
+            self._wake_pending = True
+            # Under the lock, so close() cannot close the fd in between
+            if wake and not self._polling:
+                try:
+                    os.write(self._write_fd, b"\0")
+                except (BlockingIOError, OSError):
+                    pass  # pipe full, a wake-up is pending anyway
+
+    def qsize(self) -> int:
+        with self._lock:
+            return self._depth()
+
+    def _depth(self) -> int:
+        return len(self._controls) + (self._preview is not None)
+
+    def get_stats(self) -> dict:
+        """Queue depth, dispatch latency (put to handled) and counters"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            depth = self._depth()
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "dispatched": self.dispatched,
+            "frames_dropped": self.frames_dropped,
+            "unknown": self.unknown,
+            "latency_ms_mean": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_ms_max": 1000 * latencies[-1] if latencies else 0.0,
+        }
+
+    def close(self):
+        """Stop dispatching, later put() calls are dropped"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self._polling:
+                try:
+                    self.root.tk.deletefilehandler(self._read_fd)
+                except tk.TclError:
+                    pass
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+
+    def _on_wake(self, fd, mask):
+        try:
+            os.read(self._read_fd, 4096)
+        except (BlockingIOError, OSError):
+            pass
+        self.dispatch()
+
+    def _poll(self):
+        if self._closed:
+            return
+        self.dispatch()
+        self.root.after(10, self._poll)
+
+    def dispatch(self):
+        """Handle every queued message in order, the newest preview frame where it was put"""
+        with self._lock:
+            self._wake_pending = False
+            controls, self._controls = self._controls, deque()
+            preview, self._preview = self._preview, None
+            preview_at = self._preview_at
+        DEPTH.observe(len(controls) + (preview is not None))
+
+        for i, entry in enumerate(controls):
+            if i == preview_at and preview is not None:
+                self._handle(*preview)
+            self._handle(*entry)
+        if preview is not None and preview_at >= len(controls):
+            self._handle(*preview)
+
+    def _handle(self, message, put_t, flow_id=None):
+        handler = self.handlers.get(message[0])
+        if handler is None:
+            self.unknown += 1
+            print(self.log_prefix + f"Unknown ui message {message[0]!r}")
+            return
+        with tracer.span(message[0], "ui"):
+            tracer.flow_end(flow_id, message[0], "ui_queue")
+            try:
+                handler(*message[1:])
+            except Exception as e:
+                print(self.log_prefix + f"Error handling {message[0]!r}: {e}")
+        lag = time.perf_counter() - put_t
+        DISPATCH_LAG_SECONDS.observe(lag)
+        with self._lock:
+            self.dispatched += 1
+            self._latencies.append(lag)
@@ -0,0 +1,79 @@
+import tkinter as tk
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+from interface.slide_cache import fit_size
+
+class PreviewRenderer:
+    """
+    Draws camera frames on a canvas without per-frame allocations.
+
+    One PhotoImage, one canvas item and the scaling buffers are kept per
+    preview size and updated in place; they are only rebuilt when the
+    canvas size changes. Frames that already have the preview size (see
+    FaceDetector.set_preview_size) skip scaling altogether.
+    """
+
+    def __init__(self, canvas: tk.Canvas):
+        self.canvas = canvas
+        self.size = None  # (w, h) of the current buffers
+        self.photo = None
+        self.item = None
+
+        self._scaled = None  # BGR at preview size
+        self._rgb = None
+        self._image = None  # PIL image the RGB bytes are copied into
+
+    def target_size(self, frame_w: int, frame_h: int) -> tuple[int, int]:
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if w <= 0 or h <= 0:
+            return 0, 0
+        return fit_size(frame_w, frame_h, w, h)
+
+    def detach(self):
+        """Forget the canvas item, call when something else cleared the canvas"""
+        self.item = None
+
+    def render(self, frame: np.ndarray):
+        frame_h, frame_w = frame.shape[:2]
+        w, h = self.target_size(frame_w, frame_h)
+        if w <= 0 or h <= 0:  # Skip if calculated dimensions are not valid
+            return
+
+        if self.size != (w, h) or self.photo is None:
+            self._allocate(w, h)
+            self._allocate_photo(w, h)
+        self.photo.paste(self.convert(frame, w, h))
+
+        if self.item is None:
+            # Replace whatever is on the canvas, e.g. a slide, with the preview
+            self.canvas.delete("all")
+            self.item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+        x_center = (self.canvas.winfo_width() - w) // 2
+        y_center = (self.canvas.winfo_height() - h) // 2
+        self.canvas.coords(self.item, x_center, y_center)
+
+    def convert(self, frame: np.ndarray, w: int, h: int) -> Image.Image:
+        """Scale a BGR frame to (w, h) into the reused RGB image, no Tk needed"""
+        if self.size != (w, h):
+            self._allocate(w, h)
+
+        frame_h, frame_w = frame.shape[:2]
+        if (frame_w, frame_h) == (w, h):
+            scaled = frame
+        else:
+            scaled = cv2.resize(frame, (w, h), dst=self._scaled, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        self._image.frombytes(self._rgb)
+        return self._image
+
+    def _allocate(self, w: int, h: int):
+        self.size = (w, h)
+        self._scaled = np.empty((h, w, 3), np.uint8)
+        self._rgb = np.empty((h, w, 3), np.uint8)
+        self._image = Image.new("RGB", (w, h))
+
+    def _allocate_photo(self, w: int, h: int):
+        self.photo = ImageTk.PhotoImage("RGB", (w, h))
+        if self.item is not None:
+            self.canvas.itemconfig(self.item, image=self.photo)
@@ -0,0 +1,142 @@
+import threading
+import queue
+from collections import OrderedDict
+from PIL import Image, ImageTk
+
+
+def fit_size(src_w: int, src_h: int, w: int, h: int) -> tuple[int, int]:
+    """Largest (w, h) with the source aspect ratio that fits into the box"""
+    r = src_w / src_h
+    new_height = int(w / r)
+    if new_height > h:
+        return int(h * r), h
+    return w, new_height
+
+
+class SlideCache:
+    """
+    Ready-to-show protocol slides keyed by (slide id, size).
+
+    Decoding and LANCZOS scaling run on a worker thread, the main thread only
+    turns finished images into PhotoImages (Tk is not thread safe), so showing
+    a prefetched slide is a pointer swap on the canvas.
+    """
+
+    def __init__(
+        self,
+        path_format: str = "./resources/{}.JPG",
+        max_bytes: int = 64 * 1024 * 1024,
+        lookahead: int = 2,
+        on_ready=None,
+    ):
+        self.path_format = path_format
+        self.max_bytes = max_bytes
+        self.lookahead = lookahead
+        self.on_ready = on_ready  # called from the worker when a slide needs promote()
+
+        self._entries = OrderedDict()  # (slide_id, w, h) -> [Image or PhotoImage, nbytes]
+        self._bytes = 0
+        self._sizes = {}  # slide_id -> source (w, h)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+        self.log_prefix = "  SC: "
+
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def path(self, slide_id) -> str:
+        return self.path_format.format(slide_id)
+
+    def source_size(self, slide_id) -> tuple[int, int]:
+        """Size of the original image, read from the header only"""
+        with self._lock:
+            size = self._sizes.get(slide_id)
+        if size is None:
+            with Image.open(self.path(slide_id)) as image:
+                size = image.size
+            with self._lock:
+                self._sizes[slide_id] = size
+        return size
+
+    def fit(self, slide_id, w: int, h: int) -> tuple[int, int]:
+        return fit_size(*self.source_size(slide_id), w, h)
+
+    def get(self, slide_id, w: int, h: int) -> ImageTk.PhotoImage:
+        """PhotoImage of the slide scaled to exactly (w, h), loading it on a miss"""
+        key = (slide_id, w, h)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if isinstance(entry[0], ImageTk.PhotoImage):
+                    return entry[0]
+                image = entry[0]
+            else:
+                image = None
+
+        if image is None:
+            image = self._load(slide_id, w, h)
+        photo = ImageTk.PhotoImage(image)
+        self._store(key, photo, w * h * 3)
+        return photo
+
+    def prefetch(self, slide_ids, w: int, h: int) -> None:
+        """Decode and scale the given slides in the background"""
+        for slide_id in slide_ids:
+            try:
+                key = (slide_id,) + self.fit(slide_id, w, h)
+            except OSError:
+                continue
+            with self._lock:
+                if key in self._entries or key in self._pending:
+                    continue
+                self._pending.add(key)
+            self._jobs.put(key)
+
+    def promote(self) -> None:
+        """Turn prefetched images into PhotoImages, must run on the Tk thread"""
+        with self._lock:
+            ready = [(key, entry[0]) for key, entry in self._entries.items()
+                     if not isinstance(entry[0], ImageTk.PhotoImage)]
+        for key, image in ready:
+            photo = ImageTk.PhotoImage(image)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is image:
+                    entry[0] = photo
+
+    def _load(self, slide_id, w: int, h: int) -> Image.Image:
+        with Image.open(self.path(slide_id)) as image:
+            image.draft("RGB", (w, h))  # let the JPEG decoder downscale first
+            return image.convert("RGB").resize((w, h), Image.LANCZOS)
+
+    def _store(self, key, value, nbytes: int) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = [value, nbytes]
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[1]
+
+    def _run(self):
+        while True:
+            key = self._jobs.get()
+            slide_id, w, h = key
+            try:
+                image = self._load(slide_id, w, h)
+                with self._lock:
+                    exists = key in self._entries
+                if not exists:
+                    self._store(key, image, w * h * 3)
+                    if self.on_ready is not None:
+                        self.on_ready()
+            except Exception as e:
+                print(self.log_prefix + f"Error prefetching slide {slide_id}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
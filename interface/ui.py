@@ -1,30 +1,107 @@
 import os
 import tkinter as tk
-from PIL import Image, ImageTk
+from threading import Thread, Lock
 import machine.mio as mio
-from machine.controller import MachineController
-import queue
-import pygame
-import tool.sound_tool as sound_tool
-import cv2
+from interface.slide_cache import SlideCache
+from interface.dispatcher import UiDispatcher
+from tool.startup import startup
 import time
 
+# Only what the first frame needs is imported above. pygame and the
+# controller, which brings in the web app, are imported by warm_up() once the
+# window is up, or on first use; MediaPipe when the detector is warmed up and
+# cv2 with the first preview frame.
+
 class Ui(tk.Tk):
     def __init__(self):
         super().__init__()
+        mio.init()
         self.init_ui()
         self.resizing = False  # Flag to prevent infinite loop
 
-        self.ui_queue = queue.Queue()
+        self.ui_queue = UiDispatcher(self, {
+            'update_image': self.update_image_message,
+            'play_sound': self.play_sound_message,
+            'update_start_button_text': self.start_btn_text_message,
+            'update_cv_image': self.change_cv_image,
+            'promote_slides': self.slide_cache.promote,
+        })
+        self.slide_cache.on_ready = lambda: self.ui_queue.put(('promote_slides',))
         self.machine = None
 
         self.log_prefix = "Ui: "
 
-        # Initialize pygame mixer
-        pygame.mixer.init()
+        self.sound_tool = None
+        self._sound_lock = Lock()
+        self.warm_up_thread = None
+        self.after_idle(self.interactive)
 
-        # Start the message processing loop
-        self.process_messages()
+    def interactive(self):
+        """First idle moment after the window was built, start warming up"""
+        startup.mark("interactive")
+        self.warm_up_thread = Thread(target=self.warm_up, name="warm-up", daemon=True)
+        self.warm_up_thread.start()
+
+    def warm_up(self):
+        """Load what a session needs while the operator has not pressed Start yet"""
+        try:
+            self.init_sound()
+            startup.timed_import("machine.controller")
+            startup.mark("controller ready")
+            self.warm_up_face_detection()
+            self.warm_up_camera()
+        except Exception as e:
+            # Whatever failed is loaded again, with its error, on first use
+            print(self.log_prefix + f"Warm-up failed: {e}")
+        startup.print_report()
+
+    def warm_up_face_detection(self):
+        """Have a detection graph built and run once before the next session needs it"""
+        face_detection = startup.timed_import("tool.face_detection")
+        seconds = face_detection.warm_up()
+        startup.mark("face detection ready")
+        if seconds:
+            print(self.log_prefix + f"Face detection warmed up in {1000 * seconds:.0f} ms")
+
+    def warm_up_camera(self, camera_index: int = 0):
+        """Probe the camera's capture modes once, so no session has to wait for it"""
+        capture_profile = startup.timed_import("tool.capture_profile")
+        if capture_profile.load_cached(camera_index) is not None:
+            return
+        camera_service = startup.timed_import("tool.camera_service")
+        camera = camera_service.get_camera(camera_index, profile=capture_profile.AUTO)
+        # Opening resolves AUTO: the service probes, caches the best mode and keeps it open
+        deadline = time.monotonic() + 60
+        with camera.subscribe() as frames:
+            while frames.wait_frame(timeout=1) is None:
+                if camera.open_failed or time.monotonic() > deadline:
+                    return
+        startup.mark("camera probed")
+
+    def init_sound(self, block=True):
+        """
+        Initialize the pygame mixer and decode all sounds, once. With
+        block=False returns None instead of waiting for another thread that
+        is initializing, so the Tk thread never waits on the warm-up.
+        """
+        if not self._sound_lock.acquire(block):
+            return None
+        try:
+            if self.sound_tool is not None:
+                return self.sound_tool
+            pygame = startup.timed_import("pygame")
+            sound_tool = startup.timed_import("tool.sound_tool")
+            try:
+                pygame.mixer.init()
+            except pygame.error as e:
+                print(self.log_prefix + f"No sound: {e}")
+            self.sound_tool = sound_tool
+        finally:
+            self._sound_lock.release()
+        # Outside the lock, a sound played meanwhile is decoded on demand
+        sound_tool.sound_bank.preload()
+        startup.mark("sounds ready")
+        return sound_tool
 
     def init_ui(self):
         self.font_size = 24
@@ -43,13 +120,14 @@ class Ui(tk.Tk):
         self.grid_columnconfigure(3, weight=1)
 
         # Load and display the image
-        image_path = "./resources/1.JPG"  # Replace with your image path
-        self.image = Image.open(image_path)
-        self.photo = ImageTk.PhotoImage(self.image)
+        self.slide_cache = SlideCache()
+        self.slide_id = 1
+        self.photo = None
 
         self.display = tk.Canvas(self)
         self.display.grid(row=0, column=0, rowspan=2, sticky="nsew", padx=2, pady=2)
-        self.change_image("./resources/1.JPG")
+        self.preview = None  # PreviewRenderer, created with the first camera frame
+        self.change_image(1)
 
         self.start_btn = tk.Button(self, text="Start", command=self.start_btn_event)
         self.start_btn.grid(row=0, column=1, sticky="nsew", padx=2, pady=2)
@@ -82,29 +160,33 @@ class Ui(tk.Tk):
         # Handle window close event
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-    def process_messages(self):
-        try:
-            while True:
-                message = self.ui_queue.get_nowait()
-                command = message[0]
-                if command == 'update_image':
-                    img_path = f"./resources/{message[1]}.JPG"
-                    if os.path.isfile(img_path): self.change_image(img_path)
-                elif command == 'play_sound':
-                    sound_path = f"./resources/{message[1]}.wav"
-                    if os.path.isfile(sound_path):
-                        sound_tool.play_sound(sound_path)
-                elif command == 'update_start_button_text':
-                    text = message[1]
-                    self.start_btn.config(text=text)
-                elif command == 'update_cv_image':
-                    img = message[1]
-                    self.change_cv_image(img)
-                else:
-                    break
-            self.after(50, self.process_messages)
-        except queue.Empty:
-            self.after(50, self.process_messages)
+    def update_image_message(self, slide_id):
+        img_path = self.slide_cache.path(slide_id)
+        if os.path.isfile(img_path):
+            self.change_image(slide_id)
+            self.prefetch_slides(slide_id)
+
+    def play_sound_message(self, sound_id):
+        sound_path = f"./resources/{sound_id}.wav"
+        sound_tool = self.init_sound(block=False)
+        if sound_tool is None:
+            print(self.log_prefix + f"Sound {sound_id} skipped, sound is still loading")
+            return
+        sound_tool.play_sound(sound_path)
+
+    def start_btn_text_message(self, text):
+        self.start_btn.config(text=text)
+
+    def prefetch_slides(self, slide_id):
+        """Scale the slides that follow slide_id in the protocol ahead of time"""
+        if self.machine is None or self.machine.protocol is None:
+            return
+        upcoming = self.machine.protocol.upcoming_slides(slide_id, self.slide_cache.lookahead)
+        if not upcoming:
+            return
+        w, h = self.display.winfo_width(), self.display.winfo_height()
+        if w > 0 and h > 0:
+            self.slide_cache.prefetch(upcoming, w, h)
 
     def resize_event(self, event):
         if self.resizing:
@@ -116,98 +198,53 @@ class Ui(tk.Tk):
             h = event.height
 
             if event.widget == self:
-                r = self.image.width / self.image.height
-                new_height = int(w / r)
-
-                if new_height > h:
-                    new_width = int(h * r)
-                    w, h = new_width, h
-                else:
-                    h = new_height
+                w, h = self.slide_cache.fit(self.slide_id, w, h)
 
                 if w <= 0 or h <= 0:
                     self.resizing = False
                     return
 
-                resized_image = self.image.resize((w, h), Image.LANCZOS)
-                self.photo = ImageTk.PhotoImage(resized_image)
                 self.display.configure(width=w, height=h)
-
-                # Clear the canvas and place the image in the center
-                self.display.delete("all")
-                canvas_width = self.display.winfo_width()
-                canvas_height = self.display.winfo_height()
-                x_center = (canvas_width - w) // 2
-                y_center = (canvas_height - h) // 2
-                self.display.create_image(x_center, y_center, anchor=tk.NW, image=self.photo)
+                self.draw_slide(w, h)
         finally:
             self.resizing = False
 
-    def change_image(self, file_path):
-        if file_path:
-            self.image = Image.open(file_path)
-            self.photo = ImageTk.PhotoImage(self.image)
-
-            # Resize the image to fit the canvas
-            w, h = self.display.winfo_width(), self.display.winfo_height()
-            r = self.image.width / self.image.height
-            new_height = int(w / r)
-
-            if new_height > h:
-                new_width = int(h * r)
-                w, h = new_width, h
-            else:
-                h = new_height
-
-            if w <= 0 or h <= 0:
-                self.resizing = False
-                return
-
-            resized_image = self.image.resize((w, h), Image.LANCZOS)
-            self.photo = ImageTk.PhotoImage(resized_image)
-
-            # Clear the canvas and place the new image in the center
-            self.display.delete("all")
-            canvas_width = self.display.winfo_width()
-            canvas_height = self.display.winfo_height()
-            x_center = (canvas_width - w) // 2
-            y_center = (canvas_height - h) // 2
-            self.display.create_image(x_center, y_center, anchor=tk.NW, image=self.photo)
+    def change_image(self, slide_id):
+        self.slide_id = slide_id
+
+        # Resize the image to fit the canvas
+        w, h = self.display.winfo_width(), self.display.winfo_height()
+        w, h = self.slide_cache.fit(slide_id, w, h)
+
+        if w <= 0 or h <= 0:
+            self.resizing = False
+            return
+
+        self.draw_slide(w, h)
+
+    def draw_slide(self, w, h):
+        self.photo = self.slide_cache.get(self.slide_id, w, h)
+
+        # Clear the canvas and place the new image in the center
+        self.display.delete("all")
+        if self.preview is not None:
+            self.preview.detach()
+        canvas_width = self.display.winfo_width()
+        canvas_height = self.display.winfo_height()
+        x_center = (canvas_width - w) // 2
+        y_center = (canvas_height - h) // 2
+        self.display.create_image(x_center, y_center, anchor=tk.NW, image=self.photo)
 
     def change_cv_image(self, cv_image):
-        """Convert OpenCV image to Tkinter compatible format and display it"""
+        """Display an OpenCV image, reusing the preview's PhotoImage and canvas item"""
         if cv_image is not None:
-            rgb_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(rgb_image)
-            
-            w, h = self.display.winfo_width(), self.display.winfo_height()
-            if w <= 0 or h <= 0:
-                return
-
-            img_w, img_h = pil_image.size
-            r = img_w / img_h
-
-            new_height = int(w / r)
-            if new_height > h:
-                new_width = int(h * r)
-                w, h = new_width, h
-            else:
-                h = new_height
-
-            if w <= 0 or h <= 0:  # Skip if calculated dimensions are not valid
-                return
-
-            resized_image = pil_image.resize((w, h), Image.LANCZOS)
-            
-            self.photo = ImageTk.PhotoImage(resized_image)
-
-            # Clear canvas and display new image
-            self.display.delete("all")
-            canvas_width = self.display.winfo_width()
-            canvas_height = self.display.winfo_height()
-            x_center = (canvas_width - w) // 2
-            y_center = (canvas_height - h) // 2
-            self.display.create_image(x_center, y_center, anchor=tk.NW, image=self.photo)
+            if self.preview is None:
+                from interface.preview import PreviewRenderer
+                self.preview = PreviewRenderer(self.display)
+            self.preview.render(cv_image)
+            if self.machine is not None:
+                # Let the detector scale the next frames to the canvas for us
+                self.machine.preview_size = (self.display.winfo_width(), self.display.winfo_height())
 
     def start_btn_event(self):
         print(self.log_prefix + "Machine started")
@@ -215,13 +252,18 @@ class Ui(tk.Tk):
             self.machine.set_shot(True)
             return
         self.ui_reset()
+        self.init_sound(block=False)  # if the warm-up is at it, it finishes on its own
+        from machine.controller import MachineController
         self.machine = MachineController(self.ui_queue)
+        self.machine.preview_size = (self.display.winfo_width(), self.display.winfo_height())
         self.machine.start()
 
     def stop_btn_event(self):
         if self.machine is not None:
             self.machine.stop()
             self.machine = None
+            # The session's detector closed its graph, prepare one for the next
+            Thread(target=self.warm_up_face_detection, name="warm-up", daemon=True).start()
         self.ui_reset()
 
     def up_btn_event(self, event):
@@ -243,10 +285,12 @@ class Ui(tk.Tk):
         mio.cam_go("stop")
 
     def ui_reset(self):
-        self.change_image("./resources/1.JPG")
+        self.change_image(1)
         self.start_btn.config(text="Start")
 
     def on_closing(self):
         if self.machine is not None:
             self.machine.stop()
+        print(self.log_prefix + f"ui queue stats {self.ui_queue.get_stats()}")
+        self.ui_queue.close()
         self.destroy()
@@ -0,0 +1,156 @@
+import math
+from typing import NamedTuple, Optional
+
+
+class AlignmentReport(NamedTuple):
+    aligned: bool
+    time_to_align: Optional[float]  # seconds from start to entering the band it settled in
+    overshoot: float  # largest error in pixels past the target, on the far side, settle window included
+    updates: int  # detections the controller acted on
+    final_error: Optional[float]  # last error seen, at the end of the settle window
+
+
+class BangBangAlignment:
+    """
+    The original position() law: full speed toward the target, stop as soon
+    as the error is inside tolerance.
+
+    Subclasses only replace _command(); this class keeps the bookkeeping for
+    the report. update() takes the horizontal error (nose minus focus, in
+    pixels), its velocity in pixels per second and the detection age, and
+    returns a drive in [-1, 1], negative for "left". Once aligned and the
+    camera stopped, feed observe() for a while so the report sees the
+    camera coast past the target.
+    """
+
+    settle_time = 0.0
+
+    def __init__(self, tolerance: float = 10.0):
+        self.tolerance = tolerance
+        self.start(None)
+
+    def start(self, t: Optional[float]):
+        self._start_t = t
+        self._last_t = None
+        self._initial_sign = 0.0
+        self._overshoot = 0.0
+        self._in_band_since = None
+        self._aligned_at = None
+        self._final_error = None
+        self.updates = 0
+
+    def observe(self, error: float, t: float):
+        """Bookkeeping for the report only, e.g. for detections after the camera stopped"""
+        error = float(error)
+        self._final_error = error
+        if self._start_t is None:
+            self._start_t = t
+        if not self._initial_sign and abs(error) > self.tolerance:
+            self._initial_sign = math.copysign(1.0, error)
+        if self._initial_sign and error * self._initial_sign < 0:
+            self._overshoot = max(self._overshoot, abs(error))
+
+        if abs(error) <= self.tolerance:
+            if self._in_band_since is None:
+                self._in_band_since = t
+            if self._aligned_at is None and t - self._in_band_since >= self.settle_time:
+                self._aligned_at = self._in_band_since
+        else:
+            self._in_band_since = None
+
+    def update(self, error: float, velocity: float, t: float, age: float = 0.0) -> float:
+        error = float(error)
+        self.observe(error, t)
+        dt = 0.0 if self._last_t is None else t - self._last_t
+        self._last_t = t
+        self.updates += 1
+        if self._aligned_at is not None:
+            return 0.0
+        return max(-1.0, min(1.0, self._command(error, velocity, dt, age)))
+
+    def _command(self, error: float, velocity: float, dt: float, age: float) -> float:
+        if abs(error) <= self.tolerance:
+            return 0.0
+        return math.copysign(1.0, error)
+
+    def aligned(self) -> bool:
+        return self._aligned_at is not None
+
+    def report(self) -> AlignmentReport:
+        return AlignmentReport(
+            aligned=self.aligned(),
+            time_to_align=None if self._aligned_at is None else self._aligned_at - self._start_t,
+            overshoot=self._overshoot,
+            updates=self.updates,
+            final_error=self._final_error,
+        )
+
+
+class PidAlignment(BangBangAlignment):
+    """
+    PID on the error predicted at actuation time, with feed-forward for the
+    motor's minimum drive.
+
+    The error is extrapolated with the stabilizer's velocity over the
+    detection age plus lookahead, which cancels most of the camera latency.
+    The derivative term uses that velocity instead of differencing noisy
+    detections. Inside half the tolerance the drive is zero and the integral
+    holds, so the camera does not hunt around the target. Aligned means
+    staying inside tolerance for settle_time seconds.
+    """
+
+    def __init__(
+        self,
+        kp: float = 1 / 100,
+        ki: float = 0.0,
+        kd: float = 1 / 300,
+        lookahead: float = 0.1,
+        min_drive: float = 0.1,
+        max_integral: float = 50.0,
+        tolerance: float = 10.0,
+        settle_time: float = 0.3,
+    ):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.lookahead = lookahead
+        self.min_drive = min_drive  # below this the motor does not turn
+        self.max_integral = max_integral  # pixel-seconds, anti windup
+        self.settle_time = settle_time
+        self._integral = 0.0
+        super().__init__(tolerance)
+
+    def start(self, t: Optional[float]):
+        super().start(t)
+        self._integral = 0.0
+
+    def _command(self, error: float, velocity: float, dt: float, age: float) -> float:
+        predicted = error + velocity * (age + self.lookahead)
+        if abs(predicted) <= self.tolerance / 2:
+            return 0.0
+
+        self._integral = max(-self.max_integral, min(self.max_integral, self._integral + error * dt))
+        u = self.kp * predicted + self.ki * self._integral + self.kd * velocity
+        if u == 0.0:
+            return 0.0
+        return math.copysign(self.min_drive + (1 - self.min_drive) * min(1.0, abs(u)), u)
+
+
+def drive_command(u: float, period: float) -> tuple[str, Optional[float]]:
+    """
+    cam_go side for drive u and how long to hold it before stopping, None
+    to hold until the next update. The motor is on/off, so a partial drive
+    becomes a pulse of that fraction of the detection period.
+    """
+    if u == 0.0:
+        return "stop", None
+    side = "right" if u > 0 else "left"
+    if abs(u) >= 1.0:
+        return side, None
+    return side, abs(u) * period
+
+
+alignment_modes = {
+    "bang_bang": BangBangAlignment,
+    "pid": PidAlignment,
+}
@@ -0,0 +1,89 @@
+import heapq
+import itertools
+import threading
+import time
+
+class Clock:
+    """Wall-clock time, the default for MachineController"""
+
+    def monotonic(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, n: float) -> None:
+        time.sleep(n)
+
+    def wait(self, condition: threading.Condition, timeout) -> None:
+        """condition.wait() measured in this clock's time, condition must be held"""
+        condition.wait(timeout)
+
+
+class VirtualClock(Clock):
+    """
+    Simulated time for running the controller off the Pi.
+
+    Time only moves inside wait()/sleep(), jumping to the deadline or to the
+    next timer scheduled with call_later(). With speed=None jumps are
+    instantaneous, otherwise each virtual second takes 1/speed real seconds.
+    """
+
+    def __init__(self, speed: float = None, start: float = 0.0):
+        self.speed = speed
+        self._now = start
+        self._timers = []  # heap of (when, seq, fn)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def monotonic(self) -> float:
+        with self._lock:
+            return self._now
+
+    def call_later(self, delay: float, fn) -> None:
+        """Run fn once virtual time has advanced by delay seconds"""
+        with self._lock:
+            heapq.heappush(self._timers, (self._now + delay, next(self._seq), fn))
+
+    def sleep(self, n: float) -> None:
+        condition = threading.Condition()
+        with condition:
+            deadline = self.monotonic() + n
+            while self.monotonic() < deadline:
+                self.wait(condition, deadline - self.monotonic())
+
+    def wait(self, condition: threading.Condition, timeout) -> None:
+        with self._lock:
+            target = None if timeout is None else self._now + timeout
+            if self._timers and (target is None or self._timers[0][0] < target):
+                target = self._timers[0][0]
+            start = self._now
+
+        if target is None:
+            # Nothing scheduled, only another thread can change anything
+            condition.wait()
+            return
+
+        if self.speed:
+            real_start = time.perf_counter()
+            notified = condition.wait((target - start) / self.speed)
+            if notified:
+                target = min(target, start + (time.perf_counter() - real_start) * self.speed)
+        else:
+            condition.wait(0)  # let other threads take the lock
+
+        with self._lock:
+            self._now = max(self._now, target)
+        self._fire_due(condition)
+
+    def _fire_due(self, condition: threading.Condition) -> None:
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0][0] <= self._now:
+                due.append(heapq.heappop(self._timers)[2])
+        if not due:
+            return
+        # Timers may notify the waiter themselves, so run them without its lock
+        condition.release()
+        try:
+            for fn in due:
+                fn()
+        finally:
+            condition.acquire()
@@ -1,24 +1,44 @@
 import datetime
 import time
-from threading import Thread, Lock
+from threading import Thread, Lock, Condition
 import website.web as web
 
-from tool.face_detection import FaceDetector
 from machine.mio import *
-import tool.sound_tool as sound_tool
+from machine.clock import Clock
+from machine.alignment import alignment_modes, drive_command
+from machine.protocol import protocol_action, load as load_protocol, DEFAULT_PATH
+from tool.metrics import registry
+from tool.trace import tracer
+
+STEP_SECONDS = registry.histogram(
+    "cpr_step_duration_seconds", "Time of one protocol step, sound and action", ["step"])
+STEP_OVERRUN_SECONDS = registry.histogram(
+    "cpr_step_overrun_seconds",
+    "Step time beyond its planned sleeps, waits for the operator or the sensor excluded", ["step"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
 
 class MachineController:
-    def __init__(self, ui_queue):
+    def __init__(self, ui_queue, clock=None, protocol_path=DEFAULT_PATH, session_log=None):
+        self.log_prefix = "  MC: "
+        # All waits go through the clock so a simulation can replace it
+        self.clock = clock if clock is not None else Clock()
+
         # Initialize hardware
         reset()
         self._stop = False
         self._shot = False
         self._lock = Lock()
+        self._changed = Condition(self._lock)  # notified on every stop/shot change
 
-        self.list_init()
+        # Slides, sounds and actions; see machine.protocol. Compiled by
+        # background_task, which reports a broken file instead of raising
+        self.protocol_path = protocol_path
+        self.protocol = None
 
-        if not len(self.action_dict) == len(self.process_lst):
-            raise ValueError("len(self.action_dict) != len(self.process_lst)")
+        # Per-step metrics, bound once per protocol; the plan is what sleep() was asked for
+        self._step_metrics = {}
+        self._planned = 0.0
+        self._unplanned = 0.0  # open-ended waits, e.g. for the shot button
 
         self.thread = None
         self.ui_queue = ui_queue
@@ -26,30 +46,29 @@ class MachineController:
         setup_gpio()
 
         self.face_detection_timeout = 60
+        # Longest the piston may drive down without the pressure sensor firing
+        self.max_descent_seconds = 15
         
         self.camera_enabled = True
-
-        self.log_prefix = "  MC: "
-
-    def list_init(self):
-        self.action_dict = {
-            1: lambda: self.sleep(1),
-            2: lambda: self.sleep(1),
-            3: lambda: self.sleep(1),
-            4: lambda: self.sleep(1),
-            5: lambda: self.sleep(1),
-            6: lambda: self.sleep(1),
-            7: lambda: self.sleep(1),
-            # 8: self.position,
-            8: lambda: self.sleep(1),
-            9: self.wait_for_shot,
-            10: self.electric_shocks,
-            11: self.down_until_triggered,
-            12: self.cpr,
-            13: self.breaf,
-            14: lambda: self.sleep(1),
-        }
-        self.process_lst = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14]
+        # Run capture and MediaPipe in a separate process, away from the UI's GIL
+        self.detector_in_process = False
+        # Camera mode, a tool.capture_profile.CaptureProfile, None for driver
+        # defaults or "auto" for the best mode probed once and cached on disk
+        self.capture_profile = "auto"
+        # Canvas size the camera preview is shown at, set by the UI
+        self.preview_size = None
+        # Camera alignment law, see machine.alignment; "pid" uses the
+        # stabilizer's velocity and waits for the error to settle
+        self.alignment_mode = "bang_bang"
+        self.alignment_options = {}
+        # Seconds of detections still watched after the camera stopped, so
+        # the report includes the camera coasting past the target
+        self.alignment_settle_seconds = 1.0
+
+        # Every step of a run goes to the durable session log, the clinical
+        # ./sessions.db unless a simulation or benchmark passes its own
+        self.session_log = session_log if session_log is not None else web.session_log
+        self.session_id = None
 
     def get_stop(self) -> bool:
         with self._lock:
@@ -58,6 +77,7 @@ class MachineController:
     def set_stop(self, value: bool):
         with self._lock:
             self._stop = value
+            self._changed.notify_all()
 
     def get_shot(self) -> bool:
         with self._lock:
@@ -66,132 +86,238 @@ class MachineController:
     def set_shot(self, value: bool):
         with self._lock:
             self._shot = value
+            self._changed.notify_all()
 
-    def get_sound_length(self, i):
-        sound_path = f"./resources/{i}.wav"
-        sound_length = sound_tool.get_sound_length(sound_path)
-        return sound_length * 0
-
-    def loop(self, start=1, end=None):
-        len_action_dict = len(self.action_dict)
-
-        if end is None:
-            end=len_action_dict
-
-        for i in self.process_lst[start-1:end-1]:
-            if self.get_stop():
-                break
-            print(self.log_prefix + "RUNNING IMAGE", i)
-
-            self.ui_queue.put(('update_image', i))
-            self.ui_queue.put(('play_sound', i))
-            self.sleep(self.get_sound_length(i) + 1)
-            
-            action = self.action_dict.get(i)
-            if action:
-                action()
-
+    def wake(self):
+        """Wake every waiter so it re-checks its condition, e.g. from a GPIO callback"""
+        with self._lock:
+            self._changed.notify_all()
+
+    def wait_until(self, predicate, timeout=None, poll=None) -> bool:
+        """
+        Block until predicate() is true, stop is set or timeout seconds pass.
+
+        predicate runs with the lock held, so it must not call get_stop/get_shot.
+        poll bounds each wait for conditions that nobody notifies about.
+        Returns the last value of predicate().
+        """
+        start = self.clock.monotonic()
+        deadline = None if timeout is None else start + timeout
+        try:
+            with self._changed:
+                while True:
+                    if predicate():
+                        return True
+                    if self._stop:
+                        return False
+                    remaining = None if deadline is None else deadline - self.clock.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    if poll is not None:
+                        remaining = poll if remaining is None else min(remaining, poll)
+                    self.clock.wait(self._changed, remaining)
+        finally:
+            if timeout is None:
+                self._unplanned += self.clock.monotonic() - start
+
+    def log_event(self, kind, step=None, detail=None):
+        self.session_log.event(self.session_id, kind, step, detail)
+
+    def sleep_until(self, deadline):
+        """Sleep until clock time deadline, counted as planned; no-op if it passed"""
+        remaining = deadline - self.clock.monotonic()
+        if remaining > 0:
+            self.sleep(remaining)
+
+    def run_step(self, entry, anchor):
+        """One ScheduledStep: slide, sound, its lead up to anchor + at + lead, then the action"""
+        print(self.log_prefix + "RUNNING IMAGE", entry.step)
+        self.log_event("step", entry.step)
+        step_t = self.clock.monotonic()
+        self._planned = self._unplanned = 0.0
+
+        with tracer.span(f"step {entry.step}", "protocol"):
+            self.ui_queue.put(('update_image', entry.slide))
+            if entry.sound is not None:
+                self.ui_queue.put(('play_sound', entry.sound))
+            self.sleep_until(anchor + entry.at + entry.lead)
+
+            if entry.action is not None and not self.get_stop():
+                with tracer.span(entry.action, "action"):
+                    getattr(self, entry.action)(*entry.args)
+
+        if not self.get_stop():
+            elapsed = self.clock.monotonic() - step_t
+            duration, overrun = self._step_metrics[entry.step]
+            duration.observe(elapsed)
+            overrun.observe(max(0.0, elapsed - self._planned - self._unplanned))
+
+    @protocol_action(None)
     def wait_for_shot(self):
         self.ui_queue.put(('update_start_button_text', 'Shot!'))
-        while not self.get_shot() and not self.get_stop():
-            self.sleep(0.05)
+        self.wait_until(lambda: self._shot)
         self.ui_queue.put(('update_start_button_text', 'Start'))
 
     def background_task(self):
+        # Validated before anything is marked started, an edited protocol may be broken
+        try:
+            self.protocol = load_protocol(self.protocol_path)  # recompiled only if the file changed
+        except (OSError, ValueError) as e:
+            print(self.log_prefix + f"Not starting, {e}")
+            self.ui_queue.put(('update_start_button_text', 'Protocol error'))
+            return
+        self._step_metrics = {
+            step: (STEP_SECONDS.labels(step), STEP_OVERRUN_SECONDS.labels(step))
+            for step in dict.fromkeys(entry.step for entry in self.protocol.steps)
+        }
+
         self.set_shot(False)
         web.machine_status.set_start(datetime.datetime.now())
+        self.session_id = self.session_log.start_session()
+        self.log_event("start")
 
-        self.loop(start=8)
-        for i in range(100):
+        # Deadlines are absolute within a segment, so overruns do not add up;
+        # after an open-ended action the next segment starts from now
+        segment, anchor = None, 0.0
+        for entry in self.protocol.steps:
             if self.get_stop():
                 break
-            if i == 2:
-                self.loop(start=8)
-            self.loop(start=11)
+            if entry.segment != segment:
+                segment, anchor = entry.segment, self.clock.monotonic() - entry.at
+            self.run_step(entry, anchor)
 
+        self.log_event("end", detail={"stopped": self.get_stop()})
+        self.session_log.end_session(self.session_id)
+        self.session_id = None
         web.machine_status.set_start(None)
         self.ui_queue.put(('update_image', 1))
 
+    @protocol_action(None)
     def position(self):
         if not self.camera_enabled:
             print(self.log_prefix + "camera was disabled")
             return
         
         print(self.log_prefix + "camera detection enabled!")
+        # Imported here, MediaPipe is only needed once a session reaches this step
+        # and the UI usually warmed it up in the background by then
+        if self.detector_in_process:
+            from tool.face_detection_process import ProcessFaceDetector as detector_class
+        else:
+            from tool.face_detection import FaceDetector as detector_class
         # Set display=True to enable frame capturing for UI display
-        face_detector = FaceDetector(display=True, camera_index=0)
-
+        face_detector = detector_class(display=True, camera_index=0, preview_size=self.preview_size,
+                                       capture_profile=self.capture_profile)
+        try:
+            self._align(face_detector)
+        finally:
+            # Always, or an exception leaks the camera, or the worker process and its shared memory
+            print(self.log_prefix + "Stopping face detector")
+            face_detector.stop()
+
+            # Clear the display by showing the default image after face detection is done
+            self.ui_queue.put(('update_image', 1))
+            print(self.log_prefix + "Face detector stopped")
+
+    def _align(self, face_detector):
+        """Drive the camera until the aligner is satisfied, then report"""
         start_t = time.time()
+        seq = 0  # last detection acted on
+        settle_until = None  # set once aligned and stopped
+        aligner = alignment_modes[self.alignment_mode](**self.alignment_options)
+        aligner.start(start_t)
 
         while not self.get_stop() and face_detector.get_running():
-            # Get vector from queue
-            align_vector = face_detector.get_vector()
+            # Wakes once per new detection, the timeout only keeps stop responsive
+            sample = face_detector.wait_vector(seq, timeout=0.2)
 
-            print(self.log_prefix + "getting vector")
-            
             current_time = time.time()
 
+            face_detector.set_preview_size(self.preview_size)
             frame = face_detector.get_frame()
             if frame is not None:
-                # Send the frame to the main UI for display
+                # Send the frame to the main UI for display, and to /stream
                 self.ui_queue.put(('update_cv_image', frame))
+                web.camera_stream.publish(frame)
 
-            if align_vector is None:
-                self.sleep(0.01)
-                continue
+            if settle_until is not None and current_time >= settle_until:
+                break
+            if current_time - start_t > self.face_detection_timeout:
+                print(self.log_prefix + "Face detection timeout")
+                break
 
-            x, y, v_t = align_vector
+            if sample is None:
+                continue
+            seq = sample.seq
+            if sample.value is None:  # no face in this frame
+                continue
 
             # Add timeout
-            if current_time - v_t > 2:
+            if current_time - sample.timestamp > 2:
                 cam_go("stop")
                 continue
 
-            if current_time - start_t > self.face_detection_timeout:
-                print(self.log_prefix + "Face detection timeout")
-                break
+            # Nose minus focus: negative means the camera has to go left
+            if settle_until is not None:
+                aligner.observe(-sample.value.x, current_time)
+                continue
+            drive = aligner.update(-sample.value.x, -sample.value.vx, current_time,
+                                   age=current_time - sample.timestamp)
+            if aligner.aligned():
+                cam_go("stop")
+                settle_until = current_time + self.alignment_settle_seconds
+                continue
 
-            x = -x
-                
-            if abs(x) < 10:
+            # Partial drive is a pulse of that share of one detection period
+            period = 1 / max(face_detector.get_stats().get("fps") or 30.0, 1.0)
+            side, hold = drive_command(drive, period)
+            cam_go(side)
+            if hold is not None:
+                self.sleep(hold)
                 cam_go("stop")
-                break
-            elif x < 0:
-                cam_go("left")
-            elif x > 0:
-                cam_go("right")
-            else:
-                print(self.log_prefix + "Unexpected happened in MachineController function position()")
-            
-            self.sleep(0.05)  # Small delay to prevent busy waiting
-
-        print(self.log_prefix + "Stopping face detector")
-        face_detector.stop()
-        
-        # Clear the display by showing the default image after face detection is done
-        self.ui_queue.put(('update_image', 1))
-        print(self.log_prefix + "Face detector stopped")
 
+        report = aligner.report()
+        final_error = "-" if report.final_error is None else f"{report.final_error:.0f}"
+        print(self.log_prefix + f"Alignment ({self.alignment_mode}): aligned {report.aligned}, "
+              f"time to align {report.time_to_align}, overshoot {report.overshoot:.0f} px, "
+              f"final error {final_error} px, {report.updates} updates")
+        self.log_event("alignment", detail=dict(report._asdict(), mode=self.alignment_mode))
+        stats = face_detector.get_stats()
+        print(self.log_prefix + f"Face detector {stats['fps']:.1f} fps, "
+              f"{stats['latency_ms']:.0f} ms capture to vector, "
+              f"{stats['frames_dropped']} stale frames dropped")
+
+    @protocol_action(lambda n: n)
     def sleep(self, n):
-        t = time.time()
-        while time.time() - t < n and not self.get_stop():
-            time.sleep(0.01)
+        self._planned += n
+        with tracer.span("sleep", "wait"):
+            self.wait_until(lambda: False, timeout=n)
 
+    @protocol_action(1.0)
     def electric_shocks(self):
         web.machine_status.update_status(shocks=1)
+        self.log_event("shock")
         self.sleep(1)
 
+    @protocol_action(None)
     def down_until_triggered(self):
         cpr_move("down")
-        while not self.get_stop():
-            if presure_sensor_triggered():
-                break
-            self.sleep(0.05)
+        # The sensor callback stops the motor itself, then wakes us
+        arm_pressure_stop(self.wake)
+        # The level check backs up the edge callback should it miss a press
+        pressed = self.wait_until(lambda: pressure_event.is_set() or presure_sensor_triggered(),
+                                  timeout=self.max_descent_seconds, poll=0.05)
+        disarm_pressure_stop()
         cpr_move("stop")
+        if not pressed and not self.get_stop():
+            print(self.log_prefix + f"No pressure after {self.max_descent_seconds} s of descent, motor stopped")
+            self.log_event("descent_timeout", detail={"seconds": self.max_descent_seconds})
 
+    @protocol_action(23.5 + 2)
     def cpr(self):
         print(self.log_prefix + "cpr Running")
         web.machine_status.update_status(cpr_cycles=1)
+        self.log_event("cpr_cycle")
         cpr_press_on(True)
         self.sleep(23.5)
         cpr_press_on(False)
@@ -199,9 +325,11 @@ class MachineController:
         self.sleep(2)
         cpr_move("stop")
 
+    @protocol_action(1.5)
     def breaf(self):
         print(self.log_prefix + "breaf Running")
         web.machine_status.update_status(ventilations=1)
+        self.log_event("ventilation")
         air_pump_on(True)
         self.sleep(1.5)
         air_pump_on(False)
@@ -221,6 +349,7 @@ class MachineController:
             return
         
         print(self.log_prefix + "Stop called, setting stop flag")
+        self.log_event("stop")
         self.set_stop(True)
 
         if self.thread and self.thread.is_alive():
@@ -232,7 +361,7 @@ class MachineController:
         print(self.log_prefix + "Moving cpr up")
         cpr_move("up")
         cam_go("stop")
-        time.sleep(2)
+        self.clock.sleep(2)
 
         print(self.log_prefix + "Resetting flags")
         self.set_shot(False)
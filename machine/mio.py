@@ -1,5 +1,40 @@
 from typing import Literal
-import RPi.GPIO as GPIO
+from collections import deque
+import importlib
+import os
+import threading
+import time
+from tool.metrics import registry
+from tool.trace import tracer
+
+backends = {
+    "rpi": "RPi.GPIO",
+    "sim": "machine.sim_gpio",
+}
+
+def load_backend(name=None):
+    """
+    Import a GPIO backend by name ("rpi" or "sim").
+
+    Without a name GPIO_BACKEND from the environment is used, falling back
+    to the simulator, loudly, only when RPi.GPIO is not installed. Set
+    GPIO_BACKEND=sim to choose the simulator. A RuntimeError from RPi.GPIO,
+    e.g. no access to /dev/mem when not run as root, is raised: on a Pi
+    that must not turn into a session without real outputs.
+    """
+    name = name or os.environ.get("GPIO_BACKEND")
+    if name is not None:
+        return importlib.import_module(backends[name])
+    try:
+        return importlib.import_module(backends["rpi"])
+    except ImportError:  # not on a Pi, e.g. when testing
+        print("WARNING: RPi.GPIO is not installed, using the GPIO SIMULATOR: "
+              "nothing will move and the pressure sensor never fires. "
+              "Set GPIO_BACKEND=sim to choose it explicitly.")
+        return importlib.import_module(backends["sim"])
+
+GPIO = load_backend()
+_now = time.perf_counter
 
 cpr_press = 26  # cpr 
 cpr_press_low = 20
@@ -13,36 +48,159 @@ cpr_down = 22
 # cam_down = 23
 press_trigger = 2  # input
 
+pin_names = {
+    cpr_press: "cpr_press", cpr_press_low: "cpr_press_low",
+    air_pump: "air_pump", air_pump_low: "air_pump_low",
+    cpr_up: "cpr_up", cpr_down: "cpr_down",
+}
+
+pressure_debounce_ms = 20
+pressure_event = threading.Event()  # set on a debounced press, cleared when armed
+pressure_triggered_at = None  # clock time of the last accepted press
+trigger_stop_latency = deque(maxlen=100)  # seconds from press to motor stopped
+
+GPIO_WRITE_SECONDS = registry.histogram("gpio_write_seconds", "One batched GPIO output call")
+PRESSURE_STOP_SECONDS = registry.histogram(
+    "gpio_pressure_stop_seconds", "Pressure sensor edge to cpr motor stopped")
+
+_pressure_lock = threading.Lock()
+_pressure_stop_armed = False
+_pressure_listener = None
+
+# Level every output is put back to by reset()
+safe_state = {
+    air_pump: GPIO.LOW,
+    air_pump_low: GPIO.LOW,
+    cpr_press: GPIO.LOW,
+    cpr_press_low: GPIO.LOW,
+    cpr_up: GPIO.HIGH,
+    cpr_down: GPIO.LOW,
+    # cam_up: GPIO.LOW,
+    # cam_down: GPIO.HIGH,
+}
+
+# Shadow copy of what was last written to each output, empty until setup()
+_shadow = {}
+_output_lock = threading.Lock()
+
+def init(backend=None, clock=None):
+    """
+    Select the GPIO backend and put every pin in its safe state.
+
+    backend is a name from backends or a module with the RPi.GPIO API,
+    clock anything with a monotonic() method, used for sensor timestamps.
+    """
+    global GPIO, _now
+    if backend is not None:
+        GPIO = load_backend(backend) if isinstance(backend, str) else backend
+    if clock is not None:
+        _now = clock.monotonic
+    reset(full=True)
+
 def setup():
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(cpr_press, GPIO.OUT)
-    GPIO.setup(cpr_press_low, GPIO.OUT)
-    GPIO.setup(air_pump, GPIO.OUT)
-    GPIO.setup(air_pump_low, GPIO.OUT)
-    GPIO.setup(cpr_up, GPIO.OUT)
-    GPIO.setup(cpr_down, GPIO.OUT)
-    # GPIO.setup(cam_up, GPIO.OUT)
-    # GPIO.setup(cam_down, GPIO.OUT)
-    GPIO.setup(press_trigger, GPIO.IN)
-
-def reset():
-    GPIO.cleanup()
-    setup()
-    GPIO.output(air_pump, GPIO.LOW)
-    GPIO.output(air_pump_low, GPIO.LOW)
-    GPIO.output(cpr_press, GPIO.LOW)
-    GPIO.output(cpr_press_low, GPIO.LOW)
-    GPIO.output(cpr_up, GPIO.HIGH)
-    GPIO.output(cpr_down, GPIO.LOW)
-    # GPIO.output(cam_up, GPIO.LOW)
-    # GPIO.output(cam_down, GPIO.HIGH)
+    """Configure every pin, outputs start at their shadowed or safe level"""
+    with _output_lock:
+        GPIO.setmode(GPIO.BCM)
+        for pin, level in safe_state.items():
+            level = _shadow.get(pin, level)
+            GPIO.setup(pin, GPIO.OUT, initial=level)
+            _shadow[pin] = level
+        GPIO.setup(press_trigger, GPIO.IN)
+        GPIO.remove_event_detect(press_trigger)
+        GPIO.add_event_detect(press_trigger, GPIO.FALLING, callback=_pressure_edge, bouncetime=pressure_debounce_ms)
+
+def reset(full=False):
+    """
+    Put every output back to safe_state.
+
+    Only pins that differ from it are written, full=True also releases
+    and reconfigures all pins with GPIO.cleanup().
+    """
+    if full or not _shadow:
+        with _output_lock:
+            GPIO.cleanup()
+            _shadow.clear()
+        setup()
+    write(safe_state)
 
 def setup_gpio():
-    setup()
+    if not _shadow:
+        setup()
+
+def write(levels: dict):
+    """Drive several outputs at once, skipping pins that already hold their level"""
+    with _output_lock:
+        changed = {pin: level for pin, level in levels.items() if _shadow.get(pin) != level}
+        if not changed:
+            return
+        write_t = time.perf_counter()
+        GPIO.output(list(changed), list(changed.values()))
+        done_t = time.perf_counter()
+        GPIO_WRITE_SECONDS.observe(done_t - write_t)
+        if tracer.enabled:
+            args = {pin_names.get(pin, str(pin)): level for pin, level in changed.items()}
+            tracer.complete("gpio", write_t, done_t, "gpio", args)
+        _shadow.update(changed)
 
 def presure_sensor_triggered():
     return not GPIO.input(press_trigger)
 
+def _pressure_edge(channel):
+    t = _now()
+    # Software debounce: a real press keeps the line low. A bounce may read
+    # high here while the contact settles low, and bouncetime hides that
+    # last edge, so look at the level again once the window has passed
+    if not presure_sensor_triggered():
+        recheck = threading.Timer(pressure_debounce_ms / 1000, _pressure_recheck)
+        recheck.daemon = True
+        recheck.start()
+        return
+    if pressure_triggered_at is not None and t - pressure_triggered_at < pressure_debounce_ms / 1000:
+        return
+    _pressure_accept(t)
+
+def _pressure_recheck():
+    if presure_sensor_triggered() and not pressure_event.is_set():
+        _pressure_accept(_now())
+
+def _pressure_accept(t):
+    global pressure_triggered_at, _pressure_stop_armed
+    with _pressure_lock:
+        pressure_triggered_at = t
+        if _pressure_stop_armed:
+            _pressure_stop_armed = False
+            cpr_move("stop")
+            latency = _now() - t
+            trigger_stop_latency.append(latency)
+            PRESSURE_STOP_SECONDS.observe(latency)
+        pressure_event.set()
+        listener = _pressure_listener
+
+    tracer.instant("pressure", "gpio")
+    if listener is not None:
+        listener()
+
+def arm_pressure_stop(listener=None):
+    """
+    Stop the cpr motor from the sensor callback on the next press.
+
+    listener is called after the press has been handled. Call this after
+    starting the move, a press that is already held is handled right away.
+    """
+    global _pressure_stop_armed, _pressure_listener
+    with _pressure_lock:
+        pressure_event.clear()
+        _pressure_stop_armed = True
+        _pressure_listener = listener
+    if presure_sensor_triggered():
+        _pressure_accept(_now())
+
+def disarm_pressure_stop():
+    global _pressure_stop_armed, _pressure_listener
+    with _pressure_lock:
+        _pressure_stop_armed = False
+        _pressure_listener = None
+
 cam_dict = {
     "left": (GPIO.LOW, GPIO.HIGH),
     "right": (GPIO.HIGH, GPIO.LOW),
@@ -61,16 +219,10 @@ cpr_dict = {
 }
 
 def cpr_move(side: Literal["up", "down", "stop"]):
-    GPIO.output(cpr_up, cpr_dict[side][0])
-    GPIO.output(cpr_down, cpr_dict[side][1])
+    write({cpr_up: cpr_dict[side][0], cpr_down: cpr_dict[side][1]})
 
 def air_pump_on(enable: bool):
-    GPIO.output(air_pump, GPIO.HIGH if enable else GPIO.LOW)
-    GPIO.output(air_pump_low, GPIO.LOW)
+    write({air_pump: GPIO.HIGH if enable else GPIO.LOW, air_pump_low: GPIO.LOW})
 
 def cpr_press_on(enable: bool):
-    GPIO.output(cpr_press, GPIO.HIGH if enable else GPIO.LOW)
-    GPIO.output(cpr_press_low, GPIO.LOW)
-
-setup()
-reset()
\ No newline at end of file
+    write({cpr_press: GPIO.HIGH if enable else GPIO.LOW, cpr_press_low: GPIO.LOW})
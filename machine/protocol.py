@@ -0,0 +1,267 @@
+"""
+Protocols as data: slides, sounds, actions and repeats in a JSON (or, with
+PyYAML installed, YAML) file, compiled once into a flat schedule.
+
+    {
+      "defaults": {"delay": 1, "wait_for_sound": false},
+      "steps": {
+        "9":  {"action": "wait_for_shot"},
+        "12": {"action": "cpr", "slide": 12, "sound": 12}
+      },
+      "sequences": {"cycle": [11, 12, 13]},
+      "timeline": [9, {"repeat": 100, "do": ["cycle"]}]
+    }
+
+A step shows its slide (default: its id), plays its sound (default: its
+id, skipped when there is no such WAV), waits delay seconds plus, with
+wait_for_sound, the sound's length, then runs its action. Timeline items
+are step ids, sequence names or repeats of those. Actions are controller
+methods registered with @protocol_action.
+
+    python -m machine.protocol resources/protocol.json
+"""
+import inspect
+import json
+import os
+import threading
+import wave
+from typing import NamedTuple, Optional
+
+DEFAULT_PATH = "./resources/protocol.json"
+
+# name -> (function, duration), filled by @protocol_action
+actions = {}
+
+
+def protocol_action(duration=0.0):
+    """
+    Make a controller method usable as a step action. duration is its
+    planned length in seconds, a function of the step's args returning it,
+    or None for an open-ended wait on the operator or a sensor.
+    """
+    def register(function):
+        actions[function.__name__] = (function, duration)
+        return function
+    return register
+
+
+class ScheduledStep(NamedTuple):
+    step: str
+    slide: int
+    sound: Optional[int]  # id for the UI's play_sound, None for silence
+    at: float  # planned start, seconds after the start of its segment
+    lead: float  # seconds from the step's start to its action
+    action: Optional[str]
+    args: tuple
+    duration: Optional[float]  # of the action, None if open-ended
+    segment: int  # a new segment starts after every open-ended action
+
+
+class Schedule(NamedTuple):
+    steps: tuple  # ScheduledStep in run order
+    segments: tuple  # planned seconds of each segment
+    upcoming: dict  # slide -> slides that follow it, for prefetching
+
+    def upcoming_slides(self, slide: int, count: int) -> list:
+        return self.upcoming.get(slide, [])[:count]
+
+
+def _fail(where: str, message: str):
+    raise ValueError(f"Protocol {where}: {message}" if where else f"Protocol: {message}")
+
+
+def _read(path: str) -> dict:
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                _fail(path, "YAML protocols need PyYAML, or use JSON")
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                _fail(path, str(e))
+        else:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                _fail(path, str(e))
+    if not isinstance(data, dict):
+        _fail(path, "top level must be an object")
+    return data
+
+
+def _number(where: str, value, minimum: float = 0.0) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+        _fail(where, f"expected a number >= {minimum}, got {value!r}")
+    return float(value)
+
+
+def _compile_step(step: str, spec: dict, defaults: dict, resources: str) -> dict:
+    where = f"steps.{step}"
+    if not isinstance(spec, dict):
+        _fail(where, "expected an object")
+    unknown = set(spec) - {"slide", "sound", "delay", "wait_for_sound", "action", "args"}
+    if unknown:
+        _fail(where, f"unknown fields {sorted(unknown)}")
+
+    slide = spec.get("slide", int(step) if step.isdigit() else None)
+    if not isinstance(slide, int) or not os.path.isfile(os.path.join(resources, f"{slide}.JPG")):
+        _fail(where, f"no slide {slide!r} in {resources}")
+
+    # An implicit sound may be missing, an explicit one must exist
+    sound = spec.get("sound", int(step) if step.isdigit() else None)
+    sound_length = 0.0
+    if sound is not None:
+        path = os.path.join(resources, f"{sound}.wav")
+        if os.path.isfile(path):
+            try:
+                with wave.open(path, "rb") as wav:  # header only, no decoding
+                    sound_length = wav.getnframes() / wav.getframerate()
+            except (wave.Error, EOFError) as e:
+                _fail(where, f"unreadable sound {path}: {e}")
+        elif "sound" in spec:
+            _fail(where, f"no sound {path}")
+        else:
+            sound = None
+
+    delay = _number(f"{where}.delay", spec.get("delay", defaults.get("delay", 1.0)))
+    wait_for_sound = spec.get("wait_for_sound", defaults.get("wait_for_sound", False))
+    if not isinstance(wait_for_sound, bool):
+        _fail(f"{where}.wait_for_sound", f"expected true or false, got {wait_for_sound!r}")
+    lead = delay + (sound_length if wait_for_sound else 0.0)
+
+    action, args, duration = spec.get("action"), spec.get("args", []), 0.0
+    if not isinstance(args, list):
+        _fail(f"{where}.args", "expected a list")
+    if action is not None:
+        if action not in actions:
+            _fail(f"{where}.action", f"unknown action {action!r}, one of {sorted(actions)}")
+        function, duration = actions[action]
+        try:
+            inspect.signature(function).bind(None, *args)  # None stands in for self
+        except TypeError as e:
+            _fail(f"{where}.args", f"{action}: {e}")
+        if callable(duration):
+            try:
+                duration = float(duration(*args))
+            except (TypeError, ValueError) as e:
+                _fail(f"{where}.args", f"{action}: {e}")
+    return {"slide": slide, "sound": sound, "lead": lead, "action": action,
+            "args": tuple(args), "duration": duration}
+
+
+def _expand(items, sequences: dict, steps: dict, where: str, out: list, depth: int = 0):
+    if not isinstance(items, list):
+        _fail(where, "expected a list")
+    if depth > 16:
+        _fail(where, "sequences nested too deep, is one using itself?")
+    for n, item in enumerate(items):
+        here = f"{where}[{n}]"
+        if isinstance(item, dict):
+            if set(item) != {"repeat", "do"}:
+                _fail(here, "a repeat needs exactly 'repeat' and 'do'")
+            times = item["repeat"]
+            if isinstance(times, bool) or not isinstance(times, int) or times < 1:
+                _fail(f"{here}.repeat", f"expected a positive count, got {times!r}")
+            body = []
+            _expand(item["do"], sequences, steps, f"{here}.do", body, depth + 1)
+            out.extend(body * times)
+        elif isinstance(item, str) and item in sequences:
+            _expand(sequences[item], sequences, steps, f"sequences.{item}", out, depth + 1)
+        elif str(item) in steps:
+            out.append(str(item))
+        else:
+            _fail(here, f"{item!r} is neither a step nor a sequence")
+
+
+def compile_protocol(data: dict, resources: str = "./resources") -> Schedule:
+    """Validate a parsed protocol and lay it out as a flat Schedule"""
+    if not isinstance(data, dict):
+        _fail("", "top level must be an object")
+    for key in ("steps", "timeline"):
+        if key not in data:
+            _fail(key, "missing")
+    unknown = set(data) - {"name", "defaults", "steps", "sequences", "timeline"}
+    if unknown:
+        _fail("", f"unknown fields {sorted(unknown)}")
+    defaults = data.get("defaults", {})
+    if not isinstance(defaults, dict):
+        _fail("defaults", "expected an object")
+    unknown = set(defaults) - {"delay", "wait_for_sound"}
+    if unknown:
+        _fail("defaults", f"unknown fields {sorted(unknown)}")
+    if not isinstance(data["steps"], dict):
+        _fail("steps", "expected an object of step id -> step")
+    sequences = data.get("sequences", {})
+    if not isinstance(sequences, dict):
+        _fail("sequences", "expected an object of name -> list")
+    for name, items in sequences.items():
+        if not isinstance(items, list):
+            _fail(f"sequences.{name}", "expected a list")
+
+    steps = {str(step): _compile_step(str(step), spec, defaults, resources)
+             for step, spec in data["steps"].items()}
+    order = []
+    _expand(data["timeline"], sequences, steps, "timeline", order)
+    if not order:
+        _fail("timeline", "runs no steps")
+
+    scheduled, segments = [], []
+    at = 0.0
+    for step in order:
+        spec = steps[step]
+        scheduled.append(ScheduledStep(step, spec["slide"], spec["sound"], at, spec["lead"],
+                                       spec["action"], spec["args"], spec["duration"], len(segments)))
+        at += spec["lead"]
+        if spec["duration"] is None:
+            segments.append(at)
+            at = 0.0
+        else:
+            at += spec["duration"]
+    segments.append(at)
+
+    # Slides after the first showing of each slide, wrapping around
+    slides = [s.slide for s in scheduled]
+    upcoming = {}
+    for i, slide in enumerate(slides):
+        if slide not in upcoming:
+            following = slides[i + 1:] + slides[:i]
+            upcoming[slide] = [s for s in dict.fromkeys(following) if s != slide]
+    return Schedule(tuple(scheduled), tuple(segments), upcoming)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def load(path: str = DEFAULT_PATH) -> Schedule:
+    """The compiled protocol at path, compiled again only when the file changed"""
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    schedule = compile_protocol(_read(path), os.path.dirname(path) or ".")
+    with _cache_lock:
+        _cache[path] = (mtime, schedule)
+    return schedule
+
+
+if __name__ == "__main__":
+    import argparse
+    import machine.controller  # noqa: F401, registers the actions
+    # ...in machine.protocol, which is not this __main__ module
+    from machine.protocol import load
+
+    parser = argparse.ArgumentParser(description="Validate a protocol and print its schedule")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    schedule = load(args.path)
+    for s in schedule.steps:
+        action = f"{s.action}{list(s.args) if s.args else ''}" if s.action else "-"
+        length = "open-ended" if s.duration is None else f"{s.duration:g} s"
+        print(f"segment {s.segment} +{s.at:8.2f} s  step {s.step:>3}  slide {s.slide:>2}  "
+              f"sound {s.sound if s.sound is not None else '-':>2}  lead {s.lead:g} s  {action} ({length})")
+    print(f"{len(schedule.steps)} steps, planned seconds per segment: "
+          + ", ".join(f"{t:g}" for t in schedule.segments))
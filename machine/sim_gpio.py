@@ -0,0 +1,155 @@
+"""
+In-memory stand-in for the parts of RPi.GPIO that mio uses.
+
+Inputs are driven with set_input(); edge callbacks run on a single
+dispatcher thread, the way RPi.GPIO runs them on its event thread, or
+inline when inline_callbacks is set. Every level change is appended to
+transitions as (timestamp, channel, value).
+"""
+import threading
+import queue
+import time
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+RISING = 31
+FALLING = 32
+BOTH = 33
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+
+_lock = threading.RLock()
+_mode = None
+_directions = {}
+_levels = {}
+_detections = {}  # channel -> [edge, callback, bouncetime_s, last_fired]
+_events = queue.Queue()
+_dispatcher = None
+
+clock = time.perf_counter  # timestamps for transitions
+inline_callbacks = False
+transitions = []
+output_listeners = []  # fn(channel, value), called on every output change
+
+def setmode(mode):
+    global _mode
+    _mode = mode
+
+def setwarnings(flag):
+    pass
+
+def setup(channel, direction, pull_up_down=PUD_OFF, initial=None):
+    with _lock:
+        _directions[channel] = direction
+        if direction == OUT:
+            _levels[channel] = LOW if initial is None else initial
+        elif channel not in _levels:
+            _levels[channel] = LOW if pull_up_down == PUD_DOWN else HIGH
+
+def cleanup(channel=None):
+    with _lock:
+        channels = list(_directions) if channel is None else [channel]
+        for c in channels:
+            if _directions.pop(c, None) == OUT:
+                _levels.pop(c, None)  # inputs keep whatever drives them
+            _detections.pop(c, None)
+
+def output(channel, value):
+    with _lock:
+        if isinstance(channel, (list, tuple)):
+            values = value if isinstance(value, (list, tuple)) else [value] * len(channel)
+            for c, v in zip(channel, values):
+                _output(c, v)
+        else:
+            _output(channel, value)
+
+def _output(channel, value):
+    if _directions.get(channel) != OUT:
+        raise RuntimeError(f"The GPIO channel {channel} has not been set up as an OUTPUT")
+    value = HIGH if value else LOW
+    if _levels.get(channel) == value:
+        return
+    _levels[channel] = value
+    transitions.append((clock(), channel, value))
+    for listener in output_listeners:
+        listener(channel, value)
+
+def input(channel):
+    with _lock:
+        if channel not in _directions:
+            raise RuntimeError(f"You must setup() the GPIO channel {channel} first")
+        return _levels[channel]
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    with _lock:
+        if _directions.get(channel) != IN:
+            raise RuntimeError(f"You must setup() the GPIO channel {channel} as an input first")
+        if channel in _detections:
+            raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+        bounce = 0 if bouncetime is None else bouncetime / 1000
+        _detections[channel] = [edge, [] if callback is None else [callback], bounce, None]
+
+def add_event_callback(channel, callback):
+    with _lock:
+        if channel not in _detections:
+            raise RuntimeError("Add event detection using add_event_detect first before adding a callback")
+        _detections[channel][1].append(callback)
+
+def remove_event_detect(channel):
+    with _lock:
+        _detections.pop(channel, None)
+
+def set_input(channel, value):
+    """Drive an input pin, firing edge callbacks like a real transition would"""
+    with _lock:
+        old = _levels.get(channel)
+        new = HIGH if value else LOW
+        if old == new:
+            return
+        _levels[channel] = new
+        transitions.append((clock(), channel, new))
+        detection = _detections.get(channel)
+        if detection is None:
+            return
+        edge, callbacks, bounce, last = detection
+        if edge == RISING and new != HIGH or edge == FALLING and new != LOW:
+            return
+        now = clock()
+        if last is not None and now - last < bounce:
+            return
+        detection[3] = now
+        callbacks = list(callbacks)
+
+    if inline_callbacks:
+        for callback in callbacks:
+            callback(channel)
+        return
+    for callback in callbacks:
+        _events.put((callback, channel))
+    _start_dispatcher()
+
+def get_level(channel):
+    """Current level of any pin, without the setup() check of input()"""
+    with _lock:
+        return _levels.get(channel)
+
+def _start_dispatcher():
+    global _dispatcher
+    with _lock:
+        if _dispatcher is not None:
+            return
+        _dispatcher = threading.Thread(target=_dispatch, daemon=True)
+    _dispatcher.start()
+
+def _dispatch():
+    while True:
+        callback, channel = _events.get()
+        try:
+            callback(channel)
+        except Exception as e:
+            print(f"sim_gpio: error in callback for channel {channel}: {e}")
@@ -0,0 +1,206 @@
+"""
+Replay a full MachineController session without the Pi.
+
+GPIO goes to machine.sim_gpio, all controller waits go through a
+VirtualClock and a scripted operator and pressure sensor stand in for the
+person at the machine. Run with:
+
+    python -m machine.simulation --speed 1000
+"""
+import argparse
+import math
+import queue
+import random
+import time
+from collections import deque
+import machine.mio as mio
+import machine.sim_gpio as sim_gpio
+from machine.clock import VirtualClock
+from machine.controller import MachineController
+from machine.alignment import alignment_modes, drive_command
+from tool.point_stabilizer import PointStabilizer
+from website.session_log import SessionLog
+
+class SimulatedOperator(queue.Queue):
+    """ui_queue stand-in that answers every "Shot!" prompt after shot_delay seconds"""
+
+    def __init__(self, clock, shot_delay: float = 2.0):
+        super().__init__()
+        self.clock = clock
+        self.shot_delay = shot_delay
+        self.controller = None
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if item == ('update_start_button_text', 'Shot!') and self.controller is not None:
+            self.clock.call_later(self.shot_delay, lambda: self.controller.set_shot(True))
+
+
+class PressureSensor:
+    """
+    Scripted press_trigger: pressed a while after each descent starts,
+    released when the piston goes back up.
+
+    delay is seconds of descent before contact, or a function of the descent
+    number returning that delay, or None for a sensor that never fires.
+    """
+
+    def __init__(self, clock, delay=1.0):
+        self.clock = clock
+        self.delay = delay
+        self.descents = 0
+
+    def attach(self):
+        sim_gpio.set_input(mio.press_trigger, sim_gpio.HIGH)
+        sim_gpio.output_listeners.append(self._on_output)
+
+    def detach(self):
+        sim_gpio.output_listeners.remove(self._on_output)
+
+    def _on_output(self, channel, value):
+        if channel == mio.cpr_down and value:
+            self.descents += 1
+            delay = self.delay(self.descents) if callable(self.delay) else self.delay
+            if delay is not None:
+                self.clock.call_later(delay, lambda: sim_gpio.set_input(mio.press_trigger, sim_gpio.LOW))
+        elif channel == mio.cpr_up and value:
+            sim_gpio.set_input(mio.press_trigger, sim_gpio.HIGH)
+
+
+def run_session(speed: float = None, press_delay=1.0, shot_delay: float = 2.0) -> dict:
+    """Run MachineController.background_task once and return a summary"""
+    clock = VirtualClock(speed)
+    # Module globals, put back afterwards for any real-time use of the sim backend
+    saved = sim_gpio.clock, sim_gpio.inline_callbacks, mio._now
+    sim_gpio.clock = clock.monotonic
+    sim_gpio.inline_callbacks = True
+    sim_gpio.transitions.clear()
+    try:
+        mio.init("sim", clock=clock)
+
+        sensor = PressureSensor(clock, press_delay)
+        sensor.attach()
+        ui_queue = SimulatedOperator(clock, shot_delay)
+        # Fake sessions stay out of the real log
+        controller = MachineController(ui_queue, clock=clock, session_log=SessionLog(":memory:"))
+        ui_queue.controller = controller
+
+        start = time.perf_counter()
+        try:
+            controller.background_task()
+        finally:
+            sensor.detach()
+    finally:
+        sim_gpio.clock, sim_gpio.inline_callbacks, mio._now = saved
+
+    return {
+        "virtual_seconds": clock.monotonic(),
+        "real_seconds": time.perf_counter() - start,
+        "descents": sensor.descents,
+        "gpio_transitions": len(sim_gpio.transitions),
+        "ui_messages": ui_queue.qsize(),
+    }
+
+class CameraPlant:
+    """
+    Camera pan motor seen through the image: full drive shifts the face by
+    max_speed pixels per second, the motor reaches that speed with time
+    constant tau, and the face itself drifts at face_speed.
+    """
+
+    def __init__(self, error: float = 200.0, max_speed: float = 400.0, tau: float = 0.15,
+                 face_speed: float = 0.0):
+        self.error = error  # nose minus focus in pixels, what the detector sees
+        self.max_speed = max_speed
+        self.tau = tau
+        self.face_speed = face_speed
+        self.speed = 0.0
+
+    def advance(self, drive: float, dt: float):
+        self.speed += (drive * self.max_speed - self.speed) * min(1.0, dt / self.tau)
+        self.error += (self.face_speed - self.speed) * dt
+
+
+def run_alignment(mode: str = "pid", error: float = 200.0, fps: float = 30.0, latency: float = 0.06,
+                  noise: float = 2.0, timeout: float = 10.0, seed: int = 1, plant: dict = None,
+                  controller: dict = None) -> dict:
+    """
+    Closed loop of an alignment controller, the FaceDetector stabilizer and a
+    CameraPlant in virtual time, following MachineController.position(),
+    settle window included. Returns the controller's report plus the true
+    overshoot and the error one second after the camera stopped.
+    """
+    ctl = alignment_modes[mode](**(controller or {}))
+    camera = CameraPlant(error, **(plant or {}))
+    stabilizer = PointStabilizer()
+    rng = random.Random(seed)
+    focus = 320
+    dt = 0.001
+    period = 1 / fps
+
+    t = 0.0
+    next_frame = 0.0
+    pending = deque()  # (available at, capture time, measured error)
+    drive, drive_until = 0.0, math.inf
+    stopped_at = None
+    true_overshoot = 0.0
+    sign = math.copysign(1.0, error)
+    ctl.start(0.0)
+
+    while t < timeout if stopped_at is None else t < stopped_at + 1.0:
+        if t >= next_frame:
+            pending.append((t + latency, t, camera.error + rng.gauss(0, noise)))
+            next_frame += period
+        while pending and pending[0][0] <= t:
+            _, capture_t, measured = pending.popleft()
+            nose = stabilizer.stabilize((int(focus + measured), 240), capture_t)
+            if stopped_at is not None:
+                ctl.observe(nose[0] - focus, t)
+                continue
+            u = ctl.update(nose[0] - focus, stabilizer.velocity[0], t, age=t - capture_t)
+            if ctl.aligned():
+                drive, stopped_at = 0.0, t
+                break
+            side, hold = drive_command(u, period)
+            drive = {"left": -1.0, "right": 1.0, "stop": 0.0}[side]
+            drive_until = math.inf if hold is None else t + hold
+        if t >= drive_until:
+            drive = 0.0
+        # Positive drive ("right") moves the face toward the focus point
+        camera.advance(drive, dt)
+        if camera.error * sign < 0:
+            true_overshoot = max(true_overshoot, abs(camera.error))
+        t += dt
+
+    return dict(
+        ctl.report()._asdict(),
+        true_overshoot=true_overshoot,
+        settled_error=camera.error,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a CPR session on simulated hardware")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="virtual seconds per real second, default is as fast as possible")
+    parser.add_argument("--press-delay", type=float, default=1.0,
+                        help="seconds of descent before the pressure sensor fires")
+    parser.add_argument("--shot-delay", type=float, default=2.0,
+                        help="seconds the operator takes to confirm a shot")
+    parser.add_argument("--align", nargs="+", choices=list(alignment_modes), default=None,
+                        help="instead of a session, run the camera alignment loop with these controllers")
+    parser.add_argument("--errors", type=float, nargs="+", default=[30, -80, 200, -300, 400],
+                        help="initial alignment errors in pixels")
+    parser.add_argument("--face-speed", type=float, default=0.0, help="patient drift in pixels per second")
+    args = parser.parse_args()
+
+    if args.align:
+        for mode in args.align:
+            for error in args.errors:
+                result = run_alignment(mode, error, plant={"face_speed": args.face_speed})
+                print(f"{mode} error {error:g}: " + ", ".join(
+                    f"{key}: {value:.3g}" if isinstance(value, float) else f"{key}: {value}"
+                    for key, value in result.items()))
+    else:
+        summary = run_session(args.speed, args.press_delay, args.shot_delay)
+        for key, value in summary.items():
+            print(f"{key}: {value}")
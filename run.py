@@ -1,3 +1,4 @@
+from tool.startup import startup  # first, start-up times count from here
 import os
 # Set environment variables to avoid Qt issues
 # For Raspberry Pi:
@@ -13,26 +14,25 @@ else:
 
 import tkinter as tk
 from interface.ui import Ui
-import uvicorn
-import website.web as web
 from threading import Thread
 import sys
-import cv2
 
 def run_web():
+    # Imported on this thread, FastAPI and uvicorn take longer than the whole UI
+    uvicorn = startup.timed_import("uvicorn")
+    web = startup.timed_import("website.web")
+    startup.mark("web imported")
     uvicorn.run(web.app, host="0.0.0.0", port=8000, log_level=None)
 
 if __name__ == "__main__":
     # Print system information
     print(f"Python version: {sys.version}")
-    print(f"OpenCV version: {cv2.__version__}" if 'cv2' in sys.modules else "OpenCV not imported yet")
+    print(f"OpenCV version: {sys.modules['cv2'].__version__}" if 'cv2' in sys.modules else "OpenCV not imported yet")
     print(f"Tkinter version: {tk.TkVersion}")
     
-    # Start web server
-    t = Thread(target=run_web, daemon=True)
-    t.start()
-    
-    # Create and run main application
+    # Create the main application first, the web server starts once it is up
     app = Ui()
+    startup.mark("window built")
     app.protocol("WM_DELETE_WINDOW", app.on_closing)
+    app.after_idle(lambda: Thread(target=run_web, name="web", daemon=True).start())
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,11 @@
+from typing import NamedTuple
+
+
+# Kept apart from tool.face_detection so a process that only receives vectors,
+# e.g. the parent of ProcessFaceDetector, can unpickle them without MediaPipe
+class AlignVector(NamedTuple):
+    """Focus point minus stabilized nose tip, and its velocity, in pixels and pixels/s"""
+    x: int
+    y: int
+    vx: float = 0.0
+    vy: float = 0.0
@@ -0,0 +1,315 @@
+import atexit
+import threading
+import time
+from typing import NamedTuple, Optional
+import cv2
+import numpy as np
+from tool.latest_value import LatestValue
+from tool.capture_profile import open_capture, negotiated, resolve
+from tool.metrics import registry
+
+OPEN_SECONDS = registry.histogram(
+    "camera_open_seconds", "Time to open the capture device",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0))
+FRAMES = registry.counter("camera_frames", "Frames captured by the camera service")
+SUBSCRIBERS = registry.gauge("camera_subscribers", "Open camera subscriptions")
+
+SYNTHETIC = "synthetic"
+
+
+class Frame(NamedTuple):
+    seq: int  # capture order, gaps are frames this subscriber skipped
+    image: np.ndarray  # BGR, read-only and shared by every subscriber
+    timestamp: float  # time.time() at capture
+
+
+class SyntheticCamera:
+    """
+    Stand-in for cv2.VideoCapture without a camera: a blob moving over a
+    fixed noise background, produced at fps.
+    """
+
+    def __init__(self, size: tuple[int, int] = (640, 480), fps: float = 30.0):
+        w, h = size
+        self.size = size
+        self.fps = fps
+        self._background = np.random.default_rng(1).integers(0, 255, (h, w, 3), dtype=np.uint8)
+        self._count = 0
+        self._opened = True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def read(self) -> tuple[bool, Optional[np.ndarray]]:
+        if not self._opened:
+            return False, None
+        w, h = self.size
+        frame = self._background.copy()
+        x = int(w / 2 + w / 4 * np.sin(self._count / 15))
+        cv2.ellipse(frame, (x, h // 2), (w // 10, h // 6), 0, 0, 360, (140, 170, 210), -1)
+        self._count += 1
+        return True, frame
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.size[0]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.size[1]
+        return 0.0
+
+    def release(self):
+        self._opened = False
+
+
+class Subscription:
+    """
+    One consumer's view of a CameraService.
+
+    wait_frame() returns the newest frame the consumer has not seen yet,
+    never more often than max_fps. Frames captured while the consumer was
+    busy or rate limited are skipped, not queued. Close it, or use it as a
+    context manager, so the service can release the device.
+    """
+
+    def __init__(self, service: "CameraService", max_fps: Optional[float] = None):
+        self.service = service
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        # Only frames captured from now on, the slot may hold one from before
+        # the device was last closed
+        self.seq = service.frames.latest().seq
+        self.received = 0
+        self.skipped = 0
+        self.closed = False
+        self._last_t = None
+
+    def wait_frame(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """Block for the next frame, None on timeout or when closed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.min_interval and self._last_t is not None:
+            delay = self._last_t + self.min_interval - time.monotonic()
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        sample = self.service.frames.wait_newer(self.seq, remaining)
+        if sample is None or self.closed:
+            return None
+        self.skipped += sample.seq - self.seq - 1
+        self.received += 1
+        self.seq = sample.seq
+        self._last_t = time.monotonic()
+        return Frame(*sample)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.service._unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class CameraService:
+    """
+    Owns a capture device and broadcasts every frame once to all subscribers.
+
+    The device is opened by the first subscription and released once the
+    last one has been closed for idle_timeout seconds, so consumers that
+    come and go, e.g. one detector per session, do not reopen it each time.
+    Each frame is published to a LatestValue exactly once and handed to
+    every subscriber as the same read-only array, never copied.
+
+    source is a camera index, a video file or SYNTHETIC. Files are read as
+    fast as they decode unless pace is set, and stop at their end unless
+    loop is set; the synthetic camera is always paced at its fps. Only a
+    camera index lingers open after the last subscription. profile is a
+    CaptureProfile or capture_profile.AUTO, applied when the device opens.
+    """
+
+    def __init__(
+        self,
+        source=0,
+        idle_timeout: float = 5.0,
+        pace: bool = False,
+        loop: bool = False,
+        size: tuple[int, int] = (640, 480),
+        fps: float = 30.0,
+        profile=None,
+    ):
+        self.source = source
+        self.profile = profile  # used the next time the device is opened
+        self.idle_timeout = idle_timeout
+        self.pace = pace or source == SYNTHETIC
+        self.loop = loop
+        self.size = size  # synthetic frame size
+        self.fps = fps  # synthetic rate, and pace for files without one
+
+        self.frames = LatestValue()
+        self.log_prefix = "    CAM: "
+        self._lock = threading.Lock()
+        self._users = 0
+        self._release_at = None  # monotonic time the idle device is released
+        self._thread = None
+        self._closing = None  # capture thread releasing the device, if any
+        self._open = False
+        self.open_failed = False  # the last attempt to open the device failed
+
+        # Statistics, see get_stats()
+        self.opens = 0
+        self.open_seconds = 0.0  # of the last open
+        self.frames_captured = 0
+        atexit.register(self.close)
+
+    def subscribe(self, max_fps: Optional[float] = None) -> Subscription:
+        with self._lock:
+            subscription = Subscription(self, max_fps)
+            self._users += 1
+            self._release_at = None
+            if self._thread is None:
+                # A capture thread that just went idle may still hold the device
+                self.open_failed = False
+                self._thread = threading.Thread(
+                    target=self._capture, args=(self._closing,), name="camera", daemon=True)
+                self._thread.start()
+            SUBSCRIBERS.set(self._users)
+        return subscription
+
+    def _unsubscribe(self):
+        with self._lock:
+            self._users = max(0, self._users - 1)  # close() may have zeroed it
+            if self._users == 0:
+                # Files and the synthetic camera reopen instantly, only a
+                # real device is worth keeping open
+                linger = self.idle_timeout if isinstance(self.source, int) else 0.0
+                self._release_at = time.monotonic() + linger
+            SUBSCRIBERS.set(self._users)
+
+    def close(self, timeout: float = 3.0):
+        """Release the device now, whoever is still subscribed gets no more frames"""
+        with self._lock:
+            self._release_at = time.monotonic()
+            self._users = 0
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def is_open(self) -> bool:
+        return self._open
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": self._open,
+                "subscribers": self._users,
+                "opens": self.opens,
+                "open_ms": self.open_seconds * 1000,
+                "frames_captured": self.frames_captured,
+            }
+
+    def _open_device(self):
+        if self.source == SYNTHETIC:
+            return SyntheticCamera(self.size, self.fps)
+        cap = open_capture(self.source, resolve(self.source, self.profile))
+        if cap.isOpened():
+            print(self.log_prefix + f"Capturing {negotiated(cap)}")
+        return cap
+
+    def _idle(self) -> bool:
+        """True once nobody subscribed for idle_timeout, then the thread ends"""
+        with self._lock:
+            if self._users == 0 and self._release_at is not None and time.monotonic() >= self._release_at:
+                self._closing, self._thread = self._thread, None
+                self._open = False
+                return True
+            return False
+
+    def _capture(self, previous: Optional[threading.Thread]):
+        if previous is not None:
+            previous.join()
+        print(self.log_prefix + f"Opening camera {self.source}")
+        start = time.perf_counter()
+        try:
+            cap = self._open_device()
+        except Exception as e:
+            cap = None
+            print(self.log_prefix + f"Error opening camera: {e}")
+        if cap is None or not cap.isOpened():
+            print(self.log_prefix + f"Camera {self.source} did not open")
+            with self._lock:
+                self._thread = None  # the next subscription tries again
+                self.open_failed = True
+            return
+
+        seconds = time.perf_counter() - start
+        OPEN_SECONDS.observe(seconds)
+        with self._lock:
+            self.opens += 1
+            self.open_seconds = seconds
+            self._open = True
+            self.open_failed = False
+        print(self.log_prefix + f"Camera open in {1000 * seconds:.0f} ms")
+
+        period = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or self.fps) if self.pace else 0.0
+        next_t = time.perf_counter()
+        try:
+            # read() blocks until the driver has a frame, so this loop drains the
+            # V4L2 queue as fast as the camera fills it and keeps only the newest
+            while not self._idle():
+                success, image = cap.read()
+                if not success:
+                    if not isinstance(self.source, int):
+                        if self.loop and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                            continue
+                        print(self.log_prefix + "End of video")
+                        with self._lock:
+                            self._closing, self._thread = self._thread, None
+                            self._open = False
+                        break
+                    print(self.log_prefix + "Ignoring empty camera frame.")
+                    time.sleep(0.1)  # Wait a bit longer on failure
+                    continue
+
+                if period:
+                    next_t += period
+                    delay = next_t - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_t = time.perf_counter()  # fell behind, don't burst
+
+                image.flags.writeable = False  # shared, a subscriber must copy to draw
+                self.frames.publish(image, time.time())
+                FRAMES.inc()
+                with self._lock:
+                    self.frames_captured += 1
+        except Exception as e:
+            print(self.log_prefix + f"Error in capture loop: {e}")
+            with self._lock:
+                self._closing, self._thread = self._thread, None
+                self._open = False
+        finally:
+            cap.release()
+            print(self.log_prefix + f"Camera {self.source} released")
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+def get_camera(source=0, **kwargs) -> CameraService:
+    """
+    The process-wide service for source, created on first use. kwargs only
+    apply when it is created.
+    """
+    with _services_lock:
+        service = _services.get(source)
+        if service is None:
+            service = _services[source] = CameraService(source, **kwargs)
+        return service
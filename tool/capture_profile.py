@@ -0,0 +1,229 @@
+"""
+Capture settings for a camera and a probe that picks the best ones.
+
+    python -m tool.capture_profile --source 0          # probe, cache the best mode
+    python -m tool.capture_profile --source 0 --show   # print the cached choice
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+import cv2
+
+AUTO = "auto"  # use the cached probe result, probe first if there is none
+CACHE_PATH = "./capture_profile.json"
+
+
+class CaptureProfile(NamedTuple):
+    """What to ask the driver for, None leaves the driver's default"""
+    fourcc: Optional[str] = None  # e.g. "MJPG" so the camera compresses, "YUYV" for raw
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    buffer_size: Optional[int] = None  # CAP_PROP_BUFFERSIZE, 1 keeps only the newest frame
+    backend: str = "ANY"  # cv2.CAP_<backend>, e.g. "V4L2" or "GSTREAMER"
+
+    def describe(self) -> str:
+        size = f"{self.width}x{self.height}" if self.width and self.height else "default size"
+        return f"{self.fourcc or 'default format'} {size} @ {self.fps or 'default'} fps, " \
+               f"buffer {self.buffer_size or 'default'}, {self.backend}"
+
+
+class ProbeResult(NamedTuple):
+    profile: CaptureProfile
+    fps: float  # frames read per second, steady state
+    latency_ms: float  # estimate: frames the driver had queued after a pause, plus one, times the period
+    cpu_ms: float  # CPU time per read(), decoding or colour conversion included
+    width: int  # what the driver actually delivered
+    height: int
+
+
+# Common UVC modes, MJPG first since it spares the CPU the YUYV conversion
+CANDIDATES = (
+    CaptureProfile("MJPG", 640, 480, 30, 1, "V4L2"),
+    CaptureProfile("MJPG", 1280, 720, 30, 1, "V4L2"),
+    CaptureProfile("YUYV", 640, 480, 30, 1, "V4L2"),
+    CaptureProfile("MJPG", 320, 240, 30, 1, "V4L2"),
+    CaptureProfile(None, None, None, None, None, "ANY"),  # driver defaults, as before
+)
+
+
+def open_capture(source, profile: Optional[CaptureProfile] = None) -> cv2.VideoCapture:
+    """cv2.VideoCapture for source with profile applied, format before size as V4L2 wants"""
+    if profile is None:
+        return cv2.VideoCapture(source)
+    cap = cv2.VideoCapture(source, getattr(cv2, "CAP_" + profile.backend.upper(), cv2.CAP_ANY))
+    if not cap.isOpened():
+        return cap
+    if profile.fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*profile.fourcc))
+    if profile.width and profile.height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile.height)
+    if profile.fps:
+        cap.set(cv2.CAP_PROP_FPS, profile.fps)
+    if profile.buffer_size:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, profile.buffer_size)
+    return cap
+
+
+def negotiated(cap: cv2.VideoCapture) -> str:
+    """What the driver settled on, which may differ from what was asked"""
+    code = int(cap.get(cv2.CAP_PROP_FOURCC))
+    fourcc = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code else "?"
+    return f"{fourcc} {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} " \
+           f"@ {cap.get(cv2.CAP_PROP_FPS):g} fps, {cap.getBackendName()}"
+
+
+def measure(cap: cv2.VideoCapture, frames: int = 60, warmup: int = 10, pause: float = 0.3) -> Optional[tuple]:
+    """(fps, latency_ms, cpu_ms, width, height) of an open capture, None if it delivers nothing"""
+    for _ in range(warmup):  # the first frames after a mode switch are often slow or black
+        if not cap.read()[0]:
+            return None
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    shape = None
+    for _ in range(frames):
+        success, frame = cap.read()
+        if not success:
+            return None
+        shape = frame.shape
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    fps = frames / elapsed
+    period = 1.0 / fps
+
+    # After a pause a queueing driver hands out old frames without waiting;
+    # the newest one we get is that many periods behind the camera
+    time.sleep(pause)
+    queued = 0
+    for _ in range(int(pause * fps) + 2):
+        t = time.perf_counter()
+        if not cap.read()[0]:
+            break
+        if time.perf_counter() - t > period / 2:
+            break
+        queued += 1
+    latency_ms = 1000 * (queued + 1) * period
+    return fps, latency_ms, 1000 * cpu / frames, shape[1], shape[0]
+
+
+def probe(source, candidates=CANDIDATES, frames: int = 60) -> list:
+    """ProbeResult for every candidate the camera accepts, in candidate order"""
+    results = []
+    for profile in candidates:
+        cap = open_capture(source, profile)
+        try:
+            if not cap.isOpened():
+                print(f"Probe: {profile.describe()}: did not open")
+                continue
+            measured = measure(cap, frames)
+            if measured is None:
+                print(f"Probe: {profile.describe()}: no frames")
+                continue
+            result = ProbeResult(profile, *measured)
+            print(f"Probe: {profile.describe()} -> {negotiated(cap)}: {result.fps:.1f} fps, "
+                  f"~{result.latency_ms:.0f} ms, {result.cpu_ms:.2f} ms CPU per frame")
+            results.append(result)
+        finally:
+            cap.release()
+    return results
+
+
+def best(results: list, min_fps: float = 25.0) -> Optional[ProbeResult]:
+    """
+    Lowest latency, then lowest CPU, among the modes that reach min_fps at
+    640 pixels wide or more; the fastest mode if none does.
+    """
+    usable = [r for r in results if r.fps >= min_fps and r.width >= 640]
+    if usable:
+        return min(usable, key=lambda r: (round(r.latency_ms), r.cpu_ms, -r.width))
+    return max(results, key=lambda r: r.fps, default=None)
+
+
+def camera_key(source) -> str:
+    """Cache key: the camera's name too, so swapping the camera probes again"""
+    key = str(source)
+    if isinstance(source, int):
+        try:
+            with open(f"/sys/class/video4linux/video{source}/name") as f:
+                key += ":" + f.read().strip()
+        except OSError:
+            pass
+    return key
+
+
+_cache_lock = threading.Lock()
+
+def _read_cache(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_cached(source, path: str = CACHE_PATH) -> Optional[CaptureProfile]:
+    with _cache_lock:
+        entry = _read_cache(path).get(camera_key(source))
+    if entry is None:
+        return None
+    return CaptureProfile(**entry["profile"])
+
+def save_cached(source, result: ProbeResult, results: list, path: str = CACHE_PATH):
+    with _cache_lock:
+        cache = _read_cache(path)
+        cache[camera_key(source)] = {
+            "profile": result.profile._asdict(),
+            "probed_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "results": [dict(r._asdict(), profile=r.profile._asdict()) for r in results],
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, path)
+
+def resolve(source, profile, path: str = CACHE_PATH) -> Optional[CaptureProfile]:
+    """
+    The profile to open source with. AUTO becomes the cached choice, probed
+    and cached first if there is none; files and non-cameras get None.
+    """
+    if profile != AUTO:
+        return profile
+    if not isinstance(source, int):
+        return None
+    cached = load_cached(source, path)
+    if cached is not None:
+        return cached
+    print(f"Probe: no cached capture profile for camera {camera_key(source)}, probing")
+    results = probe(source)
+    choice = best(results)
+    if choice is None:
+        return None
+    save_cached(source, choice, results, path)
+    print(f"Probe: chose {choice.profile.describe()}")
+    return choice.profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--show", action="store_true", help="print the cached profile and exit")
+    args = parser.parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    if args.show:
+        cached = load_cached(source, args.cache)
+        print(cached.describe() if cached else "No cached profile")
+    else:
+        results = probe(source, frames=args.frames)
+        choice = best(results)
+        if choice is None:
+            print("No mode delivered frames")
+        else:
+            save_cached(source, choice, results, args.cache)
+            print(f"Best: {choice.profile.describe()}, written to {args.cache}")
@@ -5,9 +5,60 @@ import cv2
 import mediapipe as mp
 import numpy as np
 from tool.point_stabilizer import PointStabilizer
+from tool.align_vector import AlignVector
+from tool.latest_value import LatestValue, Sample
+from tool.camera_service import get_camera
+from tool.metrics import registry
 from queue import Queue
 import os
 
+DETECT_SECONDS = registry.histogram(
+    "face_detector_detect_seconds", "MediaPipe detection time per frame")
+LATENCY_SECONDS = registry.histogram(
+    "face_detector_latency_seconds", "Frame capture to alignment vector")
+FPS = registry.gauge("face_detector_fps", "Frames processed per second, moving average")
+
+# Graphs built and run once by warm_up(), keyed by their options
+_warm_graphs = {}
+_warm_lock = threading.Lock()
+
+def warm_up(model_selection: int = 0, min_detection_confidence: float = 0.50,
+            frame_shape: tuple[int, int, int] = (480, 640, 3)) -> float:
+    """
+    Build a detection graph and run it on a blank frame, so the next
+    FaceDetector with these options starts without loading the model.
+    Meant for a background thread while the operator is idle, returns the
+    seconds it took, 0 if a warm graph was already waiting.
+    """
+    key = (model_selection, min_detection_confidence)
+    with _warm_lock:
+        if key in _warm_graphs:
+            return 0.0
+    start = time.perf_counter()
+    graph = mp.solutions.face_detection.FaceDetection(
+        model_selection=model_selection,
+        min_detection_confidence=min_detection_confidence,
+    )
+    graph.process(np.zeros(frame_shape, dtype=np.uint8))
+    with _warm_lock:
+        if key not in _warm_graphs:
+            _warm_graphs[key] = graph
+            graph = None
+    if graph is not None:  # another thread got there first
+        graph.close()
+    return time.perf_counter() - start
+
+def _take_graph(model_selection: int, min_detection_confidence: float):
+    """The warm graph for these options if there is one, otherwise a new one"""
+    with _warm_lock:
+        graph = _warm_graphs.pop((model_selection, min_detection_confidence), None)
+    if graph is None:
+        graph = mp.solutions.face_detection.FaceDetection(
+            model_selection=model_selection,
+            min_detection_confidence=min_detection_confidence,
+        )
+    return graph
+
 class FaceDetector:
     def __init__(
         self,
@@ -15,22 +66,72 @@ class FaceDetector:
         min_detection_confidence: float = 0.50,
         display: bool = False,
         camera_index: int = 0,
+        tracking: bool = False,
+        detect_scale: float = 1.0,
+        roi_size: float = 0.5,
+        redetect_interval: int = 30,
+        min_tracking_score: float = 0.7,
+        preview_size: Optional[tuple[int, int]] = None,
+        max_fps: Optional[float] = None,
+        capture_profile=None,
     ):
-        self.face_detection = mp.solutions.face_detection.FaceDetection(
-            model_selection=model_selection,
-            min_detection_confidence=min_detection_confidence,
-        )
+        """
+        Args:
+            camera_index: Camera index, video file or camera_service.SYNTHETIC,
+                opened through the shared CameraService for that source.
+            tracking (bool): Detect in a crop around the last stabilized nose tip
+                instead of the full frame.
+            detect_scale (float): Downscale factor applied before detection.
+            roi_size (float): Crop width and height as a fraction of the frame.
+            redetect_interval (int): Frames between full-frame detections in
+                tracking mode.
+            min_tracking_score (float): Below this detection score a crop is
+                rejected and the frame is searched in full.
+            preview_size (tuple[int, int]): Box the display frames are scaled
+                down to fit, None keeps the camera resolution.
+            max_fps (float): Process at most this many frames per second, None
+                for every frame the detector keeps up with.
+            capture_profile: CaptureProfile for the camera, capture_profile.AUTO
+                for the probed and cached best mode, None for driver defaults.
+                Applies when the device is next opened.
+        """
+        self.face_detection = _take_graph(model_selection, min_detection_confidence)
         self.camera_index = camera_index
         self._ps = PointStabilizer()
         self.focus_point = (0.5, 0.5)  # Normalized focus point
-        self.vector_queue = Queue(maxsize=5)  # Queue to store vectors with timestamps
+        # Newest (x, y) alignment vector, None when no face, stamped with capture time
+        self.vectors = LatestValue()
+        self._vector_seq = 0  # last sample returned by get_vector()
         self.frame_queue = Queue(maxsize=1)  # Queue to store latest frame for UI
         self._running = True
         self.display = display
+        self.preview_size = preview_size
+
+        self.tracking = tracking
+        self.detect_scale = detect_scale
+        self.roi_size = roi_size
+        self.redetect_interval = redetect_interval
+        self.min_tracking_score = min_tracking_score
+        self._roi_center = None  # last stabilized nose tip, in pixels
+        self._frames_since_full = 0
 
         self.log_prefix = "    FD: "
         self._lock = threading.Lock()
-            
+
+        # Frames come from the camera service, which may also feed others
+        self.camera = get_camera(camera_index)
+        if capture_profile is not None:
+            self.camera.profile = capture_profile
+        self._frames = self.camera.subscribe(max_fps)
+
+        # Statistics, see get_stats()
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.fps = 0.0
+        self.latency = 0.0  # seconds from capture to vector, smoothed
+        self._stats_alpha = 0.1
+
         # Start the processing thread
         self._thread = threading.Thread(target=self._run)
         self._thread.start()
@@ -42,6 +143,21 @@ class FaceDetector:
     def set_running(self, enable: bool) -> None:
         with self._lock:
             self._running = enable
+
+    def set_preview_size(self, preview_size: Optional[tuple[int, int]]) -> None:
+        """Box the display frames are scaled to fit, usually the UI canvas size"""
+        self.preview_size = preview_size
+
+    def get_stats(self) -> dict:
+        """Detector FPS, capture to vector latency and frame counters"""
+        with self._lock:
+            return {
+                "fps": self.fps,
+                "latency_ms": self.latency * 1000,
+                "frames_captured": self.frames_captured,
+                "frames_processed": self.frames_processed,
+                "frames_dropped": self.frames_dropped,
+            }
             
     def get_frame(self) -> Optional[np.ndarray]:
         """Get the latest processed frame with face detection visualization"""
@@ -50,73 +166,62 @@ class FaceDetector:
         except:
             return None
 
+    def _next_frame(self, timeout: float = 0.25):
+        """Wait for and take the newest frame, (None, 0) if none arrives in time"""
+        # The timeout bounds how long stop() waits for this thread
+        frame = self._frames.wait_frame(timeout)
+        if frame is None:
+            if self.camera.open_failed:
+                print(self.log_prefix + "Camera did not open, stopping")
+                self.set_running(False)
+            return None, 0.0
+        with self._lock:
+            self.frames_captured = self._frames.received + self._frames.skipped
+            self.frames_dropped = self._frames.skipped  # captured while _run was busy
+        return frame.image, frame.timestamp
+
     def _run(self):
-        print(self.log_prefix + "Starting camera")
-        try:
-            self.cap = cv2.VideoCapture(self.camera_index)
-            print(self.log_prefix + "Starting camera ok")
-        except Exception as e:
-            print(self.log_prefix + f"Error opening camera: {e}")
-            self.set_running(False)
-            return
-            
-        frames_processed = 0
-        
-        while self.get_running() and self.cap.isOpened():
+        last_t = None
+
+        while self.get_running():
             try:
-                success, frame = self.cap.read()
-                if not success:
-                    print(self.log_prefix + "Ignoring empty camera frame.")
-                    time.sleep(0.1)  # Wait a bit longer on failure
+                # Paced by the camera: block until a frame newer than the last one
+                frame, capture_t = self._next_frame()
+                if frame is None:
                     continue
-                
-                frames_processed += 1
-                if frames_processed % 100 == 0:  # Log every 100 frames
-                    print(self.log_prefix + f"Processed {frames_processed} frames")
-                
+
                 image_height, image_width, _ = frame.shape
-                
-                detections = self._detect_faces(frame)
-                
+
+                nose_tip, stabilized_nose_tip = self._track(frame, capture_t)
+
                 focus_pixel_coords = self._get_pixel_coords(
                     self.focus_point, image_width, image_height
                 )
 
-                stabilized_nose_tip = None
-                if detections:
-                    stabilized_nose_tip = self._ps.stabilize(
-                        self._get_nose_tip_coords(
-                            detections[0], image_width, image_height
-                        )
-                    )
-
-                    vector = (
+                if nose_tip is not None:
+                    vx, vy = self._ps.velocity
+                    vector = AlignVector(
                         focus_pixel_coords[0] - stabilized_nose_tip[0],
                         focus_pixel_coords[1] - stabilized_nose_tip[1],
-                        time.time()
+                        -vx,
+                        -vy,
                     )
-                    
-                    if self.vector_queue.full():
-                        try:
-                            self.vector_queue.get_nowait()  # Remove oldest vector
-                        except:
-                            pass
-                    self.vector_queue.put(vector)
+                    self.vectors.publish(vector, capture_t)
                 else:
                     # No face detected
-                    if not self.vector_queue.full():
-                        self.vector_queue.put(None)
-                    else:
-                        try:
-                            self.vector_queue.get_nowait()
-                            self.vector_queue.put(None)
-                        except:
-                            pass
+                    self.vectors.publish(None, capture_t)
+
+                self._update_stats(capture_t, last_t)
+                last_t = time.time()
 
                 # If display is enabled, prepare a frame with visualization
                 if self.display:
                     try:
-                        display_frame = frame.copy()
+                        display_frame, scale = self._preview_frame(frame)
+                        if scale != 1.0:
+                            focus_pixel_coords = self._scale_point(focus_pixel_coords, scale)
+                            if stabilized_nose_tip is not None:
+                                stabilized_nose_tip = self._scale_point(stabilized_nose_tip, scale)
                         self.draw_image(display_frame, stabilized_nose_tip, focus_pixel_coords)
                         
                         # Update the frame queue for UI to pick up
@@ -128,22 +233,88 @@ class FaceDetector:
                         self.frame_queue.put(display_frame)
                     except Exception as e:
                         print(self.log_prefix + f"Display preparation error: {e}")
-                
-                # Sleep to prevent CPU overuse and give UI thread time
-                time.sleep(1/60)
-                
+
             except Exception as e:
                 print(self.log_prefix + f"Error in processing loop: {e}")
 
-        self.set_running(False)
+        self._frames.close()
+        self.vectors.close()
         print(self.log_prefix + "Face detector thread exiting")
-        
-        try:
-            if hasattr(self, 'cap') and self.cap is not None:
-                self.cap.release()
-                print(self.log_prefix + "Camera released")
-        except Exception as e:
-            print(self.log_prefix + f"Error releasing camera: {e}")
+
+    def _update_stats(self, capture_t: float, last_t: Optional[float]) -> None:
+        now = time.time()
+        a = self._stats_alpha
+        with self._lock:
+            self.frames_processed += 1
+            self.latency = now - capture_t if self.frames_processed == 1 else (1 - a) * self.latency + a * (now - capture_t)
+            if last_t is not None and now > last_t:
+                self.fps = (1 - a) * self.fps + a / (now - last_t) if self.fps else 1 / (now - last_t)
+            frames_processed = self.frames_processed
+            fps = self.fps
+        LATENCY_SECONDS.observe(now - capture_t)
+        FPS.set(fps)
+
+        if frames_processed % 100 == 0:  # Log every 100 frames
+            print(self.log_prefix + f"Processed {frames_processed} frames, "
+                  f"{self.fps:.1f} fps, {self.latency * 1000:.0f} ms capture to vector")
+
+    def _track(self, frame: np.ndarray, capture_t: float) -> tuple:
+        """(nose tip, stabilized nose tip) of a frame, the latter centres the next ROI"""
+        detect_t = time.perf_counter()
+        nose_tip = self._find_nose_tip(frame)
+        DETECT_SECONDS.observe(time.perf_counter() - detect_t)
+
+        if nose_tip is None:
+            self._roi_center = None
+            return None, None
+        self._roi_center = self._ps.stabilize(nose_tip, capture_t)
+        return nose_tip, self._roi_center
+
+    def _find_nose_tip(self, frame: np.ndarray) -> Optional[tuple[int, int]]:
+        """Nose tip of the first face in pixels, None if there is no face"""
+        image_height, image_width, _ = frame.shape
+        box = (0, 0, image_width, image_height)
+
+        use_roi = (
+            self.tracking
+            and self._roi_center is not None
+            and self._frames_since_full < self.redetect_interval
+        )
+        if use_roi:
+            box = self._roi_box(self._roi_center, image_width, image_height)
+            self._frames_since_full += 1
+        else:
+            self._frames_since_full = 0
+
+        x0, y0, x1, y1 = box
+        detections = self._detect_faces(self._scaled(frame[y0:y1, x0:x1]))
+
+        if use_roi and (not detections or detections[0].score[0] < self.min_tracking_score):
+            # Lost the face in the crop, search the whole frame
+            x0, y0, x1, y1 = 0, 0, image_width, image_height
+            self._frames_since_full = 0
+            detections = self._detect_faces(self._scaled(frame))
+
+        if not detections:
+            return None
+        # Key points are relative to the searched region, not the frame
+        rel_x, rel_y = self._get_nose_tip_coords(detections[0], x1 - x0, y1 - y0)
+        return x0 + rel_x, y0 + rel_y
+
+    def _roi_box(
+        self, center: tuple[int, int], image_width: int, image_height: int
+    ) -> tuple[int, int, int, int]:
+        roi_w, roi_h = int(image_width * self.roi_size), int(image_height * self.roi_size)
+        x0 = min(max(center[0] - roi_w // 2, 0), image_width - roi_w)
+        y0 = min(max(center[1] - roi_h // 2, 0), image_height - roi_h)
+        return x0, y0, x0 + roi_w, y0 + roi_h
+
+    def _scaled(self, image: np.ndarray) -> np.ndarray:
+        if self.detect_scale >= 1.0:
+            return image
+        return cv2.resize(
+            image, None, fx=self.detect_scale, fy=self.detect_scale, interpolation=cv2.INTER_AREA
+        )
 
     def _detect_faces(
         self, image: np.ndarray
@@ -152,6 +323,31 @@ class FaceDetector:
         results = self.face_detection.process(image_rgb)
         return results.detections if results.detections else None
     
+    def _preview_frame(self, frame: np.ndarray) -> tuple[np.ndarray, float]:
+        """Copy of the frame to draw on, already at preview size, and its scale"""
+        preview_size = self.preview_size
+        image_height, image_width, _ = frame.shape
+        if preview_size is None or preview_size[0] <= 0 or preview_size[1] <= 0:
+            return frame.copy(), 1.0
+
+        # Same fit as the UI uses, so it can show the frame without rescaling
+        w, h = preview_size
+        r = image_width / image_height
+        new_height = int(w / r)
+        if new_height > h:
+            w = int(h * r)
+        else:
+            h = new_height
+        if w <= 0 or h <= 0 or w >= image_width:
+            return frame.copy(), 1.0
+
+        # resize writes a new array, so no extra copy is needed
+        preview = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        return preview, w / image_width
+
+    def _scale_point(self, point: tuple[int, int], scale: float) -> tuple[int, int]:
+        return int(point[0] * scale), int(point[1] * scale)
+
     def draw_image(self, frame, stabilized_nose_tip, focus_pixel_coords):
         if stabilized_nose_tip is None:
             stabilized_nose_tip = focus_pixel_coords
@@ -204,18 +400,31 @@ class FaceDetector:
         )
 
     def get_vector(self) -> Optional[tuple[int, int, float]]:
-        """Get the latest vector from the queue. Returns None if no vector is available."""
-        try:
-            return self.vector_queue.get_nowait()
-        except:
+        """Newest (x, y, capture time) not returned before, None if there is none or no face"""
+        sample = self.vectors.latest()
+        if sample.seq <= self._vector_seq:
             return None
+        self._vector_seq = sample.seq
+        if sample.value is None:
+            return None
+        return (sample.value.x, sample.value.y, sample.timestamp)
+
+    def wait_vector(self, after_seq: int = 0, timeout: Optional[float] = None) -> Optional[Sample]:
+        """
+        Block until a detection newer than after_seq is published.
+
+        Returns the Sample, whose value is an AlignVector or None when no face
+        was found, or None on timeout or once the detector stopped.
+        """
+        return self.vectors.wait_newer(after_seq, timeout)
 
     def stop(self):
         print(self.log_prefix + "Face detector stop called")
         # First set the running flag to false to stop the thread
         self.set_running(False)
         
-        # Wait for thread to finish
+        # Wait for the thread to finish, it closes the camera subscription;
+        # the camera service releases the device once nobody uses it
         if self._thread and self._thread.is_alive():
             try:
                 print(self.log_prefix + "Waiting for thread to finish...")
@@ -223,17 +432,9 @@ class FaceDetector:
                 print(self.log_prefix + "Thread finished or timed out")
             except Exception as e:
                 print(self.log_prefix + f"Error joining thread: {e}")
-        
-        # Clean up resources in a specific order
-        # 1. Release camera
-        try:
-            if hasattr(self, 'cap') and self.cap is not None:
-                self.cap.release()
-                print(self.log_prefix + "Camera released in stop method")
-        except Exception as e:
-            print(self.log_prefix + f"Error releasing camera in stop: {e}")
-            
-        # 2. Close mediapipe resources
+        self._frames.close()
+
+        # Close mediapipe resources
         try:
             self.face_detection.close()
             print(self.log_prefix + "Face detection closed")
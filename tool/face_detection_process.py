@@ -0,0 +1,206 @@
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Optional
+import numpy as np
+from tool.latest_value import LatestValue, Sample
+from tool.metrics import registry
+
+# Detection runs in the worker, only what it reports back reaches this process
+FPS = registry.gauge("face_detector_fps", "Frames processed per second, moving average")
+
+# Each ring slot starts with (sequence before, sequence after) the frame was
+# written, a reader's copy is good only if both still equal its frame's number
+HEADER_BYTES = 16
+
+def _slot_header(buf, slot: int, slot_bytes: int) -> np.ndarray:
+    return np.ndarray((2,), np.uint64, buf, slot * slot_bytes)
+
+def _worker(conn, shm_name, slots, slot_bytes, stop_event, preview_size, detector_kwargs):
+    """Runs a FaceDetector in the child process and forwards what it produces"""
+    from tool.face_detection import FaceDetector
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    detector = FaceDetector(**detector_kwargs)
+    slot = 0
+    processed = 0
+    seq = 0
+    written = 0  # frames written to the ring
+    view = header = None
+    try:
+        while not stop_event.is_set() and detector.get_running():
+            w, h = preview_size[:]
+            detector.set_preview_size((w, h) if w > 0 else None)
+            sample = detector.wait_vector(seq, timeout=0.1)
+            if sample is None:
+                continue
+            seq = sample.seq
+            conn.send(("vector", sample.value, sample.timestamp))
+
+            frame = detector.get_frame()
+            if frame is not None:
+                if frame.nbytes > slot_bytes - HEADER_BYTES:
+                    print(detector.log_prefix + f"Frame of {frame.shape} does not fit a shared memory slot")
+                else:
+                    written += 1
+                    header = _slot_header(shm.buf, slot, slot_bytes)
+                    header[0] = written
+                    view = np.ndarray(frame.shape, frame.dtype, shm.buf, slot * slot_bytes + HEADER_BYTES)
+                    view[...] = frame
+                    header[1] = written
+                    conn.send(("frame", slot, written, frame.shape, frame.dtype.str))
+                    slot = (slot + 1) % slots
+
+            processed += 1
+            if processed % 30 == 0:
+                conn.send(("stats", detector.get_stats()))
+    except (BrokenPipeError, EOFError):
+        pass
+    finally:
+        detector.stop()
+        view = header = None  # release the buffer exports before closing
+        shm.close()
+        conn.close()
+
+
+class ProcessFaceDetector:
+    """
+    FaceDetector running in its own process, with the same public API.
+
+    Capture and MediaPipe no longer compete with the Tk loop, uvicorn and
+    the controller for the GIL. Frames come back through a shared-memory
+    ring buffer of `slots` frames, vectors and frame notices through a pipe.
+    """
+
+    def __init__(
+        self,
+        display: bool = False,
+        camera_index: int = 0,
+        slots: int = 4,
+        max_frame_shape: tuple[int, int, int] = (1080, 1920, 3),
+        **kwargs,
+    ):
+        self.display = display
+        self.camera_index = camera_index
+        self.vectors = LatestValue()  # republished from the worker, see FaceDetector.vectors
+        self._vector_seq = 0
+        self._running = True
+        # Until the worker's first report, the keys FaceDetector.get_stats() has
+        self._stats = {"fps": 0.0, "latency_ms": 0.0, "frames_captured": 0,
+                       "frames_processed": 0, "frames_dropped": 0}
+        self._frame = None  # (slot, number, shape, dtype) of the newest frame not yet taken
+        self.frames_torn = 0  # copies dropped because the worker rewrote the slot meanwhile
+
+        self.log_prefix = "    PFD: "
+        self._lock = threading.Lock()
+
+        self._slots = slots
+        self._slot_bytes = HEADER_BYTES + int(np.prod(max_frame_shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * self._slot_bytes)
+
+        # spawn, forking a process that runs Tk and threads is not safe
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe(duplex=False)
+        self._stop_event = ctx.Event()
+        self._preview_size = ctx.Array("i", kwargs.pop("preview_size", None) or (0, 0))
+        detector_kwargs = dict(kwargs, display=display, camera_index=camera_index)
+        self._process = ctx.Process(
+            target=_worker,
+            args=(child_conn, self._shm.name, slots, self._slot_bytes, self._stop_event,
+                  self._preview_size, detector_kwargs),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+
+    def get_running(self) -> bool:
+        with self._lock:
+            return self._running
+
+    def set_running(self, enable: bool) -> None:
+        with self._lock:
+            self._running = enable
+
+    def set_preview_size(self, preview_size: Optional[tuple[int, int]]) -> None:
+        """Box the display frames are scaled to fit, usually the UI canvas size"""
+        self._preview_size[:] = preview_size or (0, 0)
+
+    def get_stats(self) -> dict:
+        """Latest statistics reported by the FaceDetector in the worker"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _receive(self):
+        while True:
+            try:
+                message = self._conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if message[0] == "vector":
+                self.vectors.publish(message[1], message[2])
+            elif message[0] == "frame":
+                with self._lock:
+                    self._frame = message[1:]
+            elif message[0] == "stats":
+                with self._lock:
+                    self._stats = message[1]
+                FPS.set(message[1].get("fps", 0.0))
+
+        print(self.log_prefix + "Worker process disconnected")
+        self.set_running(False)
+        self.vectors.close()
+
+    def get_frame(self) -> Optional[np.ndarray]:
+        """Get the latest processed frame with face detection visualization"""
+        with self._lock:
+            frame, self._frame = self._frame, None
+        if frame is None:
+            return None
+        slot, number, shape, dtype = frame
+        header = _slot_header(self._shm.buf, slot, self._slot_bytes)
+        view = np.ndarray(shape, np.dtype(dtype), self._shm.buf, slot * self._slot_bytes + HEADER_BYTES)
+        # Copy out, the worker reuses the slot once the ring wraps around;
+        # if it did during the copy, the copy is torn or a newer frame
+        image = view.copy()
+        if header[0] != number or header[1] != number:
+            self.frames_torn += 1
+            return None
+        return image
+
+    def get_vector(self) -> Optional[tuple[int, int, float]]:
+        """Newest (x, y, capture time) not returned before, None if there is none or no face"""
+        sample = self.vectors.latest()
+        if sample.seq <= self._vector_seq:
+            return None
+        self._vector_seq = sample.seq
+        if sample.value is None:
+            return None
+        return (sample.value.x, sample.value.y, sample.timestamp)
+
+    def wait_vector(self, after_seq: int = 0, timeout: Optional[float] = None) -> Optional[Sample]:
+        """Block until a detection newer than after_seq arrives, see FaceDetector.wait_vector"""
+        return self.vectors.wait_newer(after_seq, timeout)
+
+    def stop(self):
+        print(self.log_prefix + "Face detector stop called")
+        self._stop_event.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            print(self.log_prefix + "Worker did not exit, terminating")
+            self._process.terminate()
+            self._process.join(timeout=1)
+        self.set_running(False)
+
+        # The receiver sees EOF once the worker is gone
+        self._thread.join(timeout=1)
+        self._conn.close()
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except Exception as e:
+            print(self.log_prefix + f"Error releasing shared memory: {e}")
+        print(self.log_prefix + "Face detector stopped completely")
@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+
+class Sample(NamedTuple):
+    seq: int  # 1 for the first published value, +1 for each one after
+    value: Any
+    timestamp: float  # when the value was observed, e.g. frame capture time
+
+
+class LatestValue:
+    """
+    Single-slot channel that only keeps the newest value.
+
+    A producer publishes and never blocks; a consumer remembers the seq of
+    the last sample it handled and waits for a newer one, so it reacts once
+    per new value and skips anything it was too slow for.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition(threading.Lock())
+        self._sample = Sample(0, None, 0.0)
+        self._closed = False
+
+    def publish(self, value, timestamp: float = None) -> int:
+        with self._changed:
+            seq = self._sample.seq + 1
+            self._sample = Sample(seq, value, time.time() if timestamp is None else timestamp)
+            self._changed.notify_all()
+        return seq
+
+    def latest(self) -> Sample:
+        """Newest sample, seq 0 if nothing was published yet"""
+        return self._sample
+
+    def wait_newer(self, seq: int, timeout: float = None) -> Optional[Sample]:
+        """Block until a sample newer than seq exists, None on timeout or close"""
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._sample.seq > seq or self._closed, timeout):
+                return None
+            if self._sample.seq > seq:
+                return self._sample
+            return None
+
+    def close(self):
+        """Wake every waiter, e.g. when the producer stops"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
@@ -1,7 +1,14 @@
 import math
+import numpy as np
 
 class PointStabilizer:
-    def __init__(self, alpha_min: float = 0.05, alpha_max: float = 0.35, threshold: float = 100.0):
+    def __init__(
+        self,
+        alpha_min: float = 0.05,
+        alpha_max: float = 0.35,
+        threshold: float = 100.0,
+        velocity_alpha: float = 0.3,
+    ):
         """
         Initializes the point stabilizer with inverted dynamic alpha.
 
@@ -9,12 +16,18 @@ class PointStabilizer:
             alpha_min (float): Minimum smoothing factor for small movements.
             alpha_max (float): Maximum smoothing factor for large movements.
             threshold (float): Distance threshold to switch between min and max alpha.
+            velocity_alpha (float): Smoothing factor of the velocity estimate.
         """
         self.alpha_min = alpha_min
         self.alpha_max = alpha_max
         self.threshold = threshold
+        self.velocity_alpha = velocity_alpha
         self.stabilized_point: tuple[float, float] = (0.0, 0.0)
         self.is_initialized = False
+        # Pixels per second of the stabilized point, only updated when
+        # stabilize() gets timestamps
+        self.velocity: tuple[float, float] = (0.0, 0.0)
+        self._last_t = None
 
     def calculate_dynamic_alpha(self, distance: float) -> float:
         """
@@ -31,12 +44,13 @@ class PointStabilizer:
         else:
             return self.alpha_min + (self.alpha_max - self.alpha_min) * (distance / self.threshold)
 
-    def stabilize(self, new_point: tuple[int, int]) -> tuple[int, int]:
+    def stabilize(self, new_point: tuple[int, int], t: float = None) -> tuple[int, int]:
         """
         Stabilizes the given point using an inverted dynamic alpha.
 
         Args:
             new_point (Tuple[float, float]): The new point to stabilize.
+            t (float): Time the point was observed, enables the velocity estimate.
 
         Returns:
             Tuple[float, float]: The stabilized point.
@@ -44,6 +58,7 @@ class PointStabilizer:
         if not self.is_initialized:
             self.stabilized_point = new_point
             self.is_initialized = True
+            self._last_t = t
             return self.stabilized_point
 
         spx, spy = self.stabilized_point[0], self.stabilized_point[1]
@@ -58,4 +73,187 @@ class PointStabilizer:
         y_stabilized = alpha * npy + (1 - alpha) * spy
 
         self.stabilized_point = (int(x_stabilized), int(y_stabilized))
+
+        if t is not None and self._last_t is not None and t > self._last_t:
+            dt = t - self._last_t
+            a = self.velocity_alpha
+            self.velocity = (
+                a * (self.stabilized_point[0] - spx) / dt + (1 - a) * self.velocity[0],
+                a * (self.stabilized_point[1] - spy) / dt + (1 - a) * self.velocity[1],
+            )
+        self._last_t = t
         return self.stabilized_point
+
+
+class BatchPointStabilizer:
+    # Up to this many points a plain float loop beats NumPy's per-call overhead
+    small_batch = 16
+
+    def __init__(
+        self,
+        num_points: int = 1,
+        alpha_min: float = 0.05,
+        alpha_max: float = 0.35,
+        threshold: float = 100.0,
+        truncate: bool = False,
+    ):
+        """
+        PointStabilizer for N points at once, e.g. all face keypoints.
+
+        Each point is filtered exactly like PointStabilizer.stabilize, but
+        the state stays float instead of being cut to int every step, which
+        drags the estimate toward the origin. NaN marks a missing point; it
+        keeps its previous state.
+
+        Args:
+            num_points (int): Points filtered per call.
+            alpha_min (float): Minimum smoothing factor for small movements.
+            alpha_max (float): Maximum smoothing factor for large movements.
+            threshold (float): Distance threshold to switch between min and max alpha.
+            truncate (bool): Truncate the state to int like PointStabilizer, for
+                bit-identical results.
+        """
+        self.num_points = num_points
+        self.alpha_min = alpha_min
+        self.alpha_max = alpha_max
+        self.threshold = threshold
+        self.truncate = truncate
+        self._small = num_points <= self.small_batch
+
+        if not self._small:
+            # Scratch buffers reused by every call
+            self._distance = np.empty(num_points)
+            self._alpha = np.empty((num_points, 1))
+            self._blend = np.empty((num_points, 2))
+            self._new = np.empty(num_points, dtype=bool)
+            self._update = np.empty(num_points, dtype=bool)
+        self.reset()
+
+    def reset(self):
+        if self._small:
+            self._xs = [0.0] * self.num_points
+            self._ys = [0.0] * self.num_points
+            self._initialized = [False] * self.num_points
+        else:
+            self._state = np.zeros((self.num_points, 2))
+            self._initialized = np.zeros(self.num_points, dtype=bool)
+
+    @property
+    def stabilized_points(self) -> np.ndarray:
+        """(num_points, 2) float copy of the current state"""
+        if self._small:
+            return np.array([self._xs, self._ys]).T
+        return self._state.copy()
+
+    @property
+    def is_initialized(self) -> np.ndarray:
+        return np.array(self._initialized, dtype=bool)
+
+    def calculate_dynamic_alpha(self, distance: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Vector form of PointStabilizer.calculate_dynamic_alpha"""
+        if out is None:
+            out = np.empty_like(distance, dtype=float)
+        np.divide(distance, self.threshold, out=out)
+        np.multiply(out, self.alpha_max - self.alpha_min, out=out)
+        np.add(out, self.alpha_min, out=out)
+        out[distance > self.threshold] = self.alpha_max
+        return out
+
+    def stabilize(self, new_points) -> np.ndarray:
+        """
+        Stabilizes one observation of every point.
+
+        Args:
+            new_points: (num_points, 2) array-like of x, y, NaN for missing.
+
+        Returns:
+            np.ndarray: (num_points, 2) float copy of the stabilized points.
+        """
+        if self._small:
+            if isinstance(new_points, np.ndarray):
+                new_points = new_points.reshape(self.num_points, 2).tolist()
+            self._step_small(new_points)
+        else:
+            self._step(np.asarray(new_points, dtype=float).reshape(self.num_points, 2))
+        return self.stabilized_points
+
+    def stabilize_track(self, track) -> np.ndarray:
+        """
+        Stabilizes a whole recorded track, continuing from the current state.
+
+        Args:
+            track: (T, 2) for a single point or (T, num_points, 2) array-like.
+
+        Returns:
+            np.ndarray: Stabilized points with the shape of track.
+        """
+        track = np.asarray(track, dtype=float)
+        steps = track.reshape(len(track), self.num_points, 2)
+        if self._small:
+            # Point by point along time, the state stays in local floats
+            result = np.empty_like(steps)
+            for i in range(self.num_points):
+                result[:, i] = self._filter_small(i, steps[:, i].tolist())
+        else:
+            result = np.empty_like(steps)
+            for t in range(len(steps)):
+                self._step(steps[t])
+                result[t] = self._state
+        return result.reshape(track.shape)
+
+    def _step_small(self, points):
+        for i, point in enumerate(points):
+            self._filter_small(i, (point,))
+
+    def _filter_small(self, i: int, points) -> list:
+        """Feed point i a sequence of observations, returns the state after each"""
+        spx, spy, initialized = self._xs[i], self._ys[i], self._initialized[i]
+        alpha_min, alpha_max, threshold = self.alpha_min, self.alpha_max, self.threshold
+        truncate = self.truncate
+        out = []
+        for npx, npy in points:
+            if npx != npx or npy != npy:  # NaN, point missing
+                pass
+            elif not initialized:
+                spx, spy = float(npx), float(npy)
+                initialized = True
+            else:
+                # Same expressions as PointStabilizer.stabilize
+                dx, dy = npx - spx, npy - spy
+                distance = math.sqrt(dx * dx + dy * dy)
+                if distance > threshold:
+                    alpha = alpha_max
+                else:
+                    alpha = alpha_min + (alpha_max - alpha_min) * (distance / threshold)
+                x = alpha * npx + (1 - alpha) * spx
+                y = alpha * npy + (1 - alpha) * spy
+                if truncate:
+                    x, y = float(int(x)), float(int(y))
+                spx, spy = x, y
+            out.append((spx, spy))
+        self._xs[i], self._ys[i], self._initialized[i] = spx, spy, initialized
+        return out
+
+    def _step(self, points: np.ndarray):
+        state = self._state
+        valid = ~np.isnan(points[:, 0]) & ~np.isnan(points[:, 1])
+        np.logical_and(valid, ~self._initialized, out=self._new)
+        np.logical_and(valid, self._initialized, out=self._update)
+
+        # Same operations and order as the scalar path, so truncate=True matches it
+        delta = self._blend
+        np.subtract(points, state, out=delta)
+        np.multiply(delta, delta, out=delta)
+        np.add(delta[:, 0], delta[:, 1], out=self._distance)
+        np.sqrt(self._distance, out=self._distance)
+        self.calculate_dynamic_alpha(self._distance, out=self._alpha[:, 0])
+
+        blend = self._blend
+        np.multiply(self._alpha, points, out=blend)
+        blend += (1 - self._alpha) * state
+        if self.truncate:
+            np.trunc(blend, out=blend)
+
+        np.copyto(state, blend, where=self._update[:, None])
+        np.copyto(state, points, where=self._new[:, None])
+        self._initialized |= self._new
@@ -1,28 +1,98 @@
 import os
+import glob
+import wave
+import threading
+from collections import OrderedDict
 import pygame
 import time
 
+class SoundBank:
+    """
+    Decoded sounds kept in memory so playing a protocol step does no disk I/O.
+
+    Sounds are decoded by preload() or lazily on first use, and evicted least
+    recently used first once max_bytes is exceeded. Durations come from the
+    WAV header and never need a decode.
+    """
+
+    def __init__(self, directory: str = "./resources", max_bytes: int = 64 * 1024 * 1024, num_channels: int = 8):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.num_channels = num_channels
+
+        self._sounds = OrderedDict()  # path -> (pygame.mixer.Sound, nbytes)
+        self._bytes = 0
+        self._lengths = {}  # path -> seconds
+        self._lock = threading.Lock()
+
+    def preload(self):
+        """Read every WAV header and, if the mixer is ready, decode every sound"""
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.wav")))
+        for path in paths:
+            self.get_length(path)
+        if pygame.mixer.get_init():
+            pygame.mixer.set_num_channels(self.num_channels)
+            for path in paths:
+                self.get_sound(path)
+
+    def get_length(self, sound_path) -> float:
+        """Length of a WAV file in seconds, taken from its header"""
+        with self._lock:
+            length = self._lengths.get(sound_path)
+        if length is not None:
+            return length
+
+        if not os.path.exists(sound_path):
+            length = 0  # remembered so missing steps don't hit the disk again
+        else:
+            try:
+                with wave.open(sound_path, "rb") as wav:
+                    length = wav.getnframes() / wav.getframerate()
+            except (wave.Error, EOFError, OSError) as e:
+                print(f"Error getting sound length: {e}")
+                return 0
+
+        with self._lock:
+            self._lengths[sound_path] = length
+        return length
+
+    def get_sound(self, sound_path) -> pygame.mixer.Sound:
+        with self._lock:
+            entry = self._sounds.get(sound_path)
+            if entry is not None:
+                self._sounds.move_to_end(sound_path)
+                return entry[0]
+
+        sound = pygame.mixer.Sound(sound_path)
+        freq, size, channels = pygame.mixer.get_init()
+        nbytes = int(sound.get_length() * freq) * (abs(size) // 8) * channels
+
+        with self._lock:
+            if sound_path not in self._sounds:
+                self._sounds[sound_path] = (sound, nbytes)
+                self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._sounds) > 1:
+                _, (_, evicted) = self._sounds.popitem(last=False)
+                self._bytes -= evicted
+        return sound
+
+    def play(self, sound_path):
+        sound = self.get_sound(sound_path)
+        # Reuse a free mixer channel, or the longest playing one if all are busy
+        channel = pygame.mixer.find_channel(True)
+        channel.play(sound)
+
+sound_bank = SoundBank()
+
 def get_sound_length(sound_path):
     """Gets the length of a sound file in seconds"""
-    if not os.path.exists(sound_path):
-        return 0
-        
-    try:
-        sound = pygame.mixer.Sound(sound_path)
-        length = sound.get_length()
-        return length
-    except Exception as e:
-        print(f"Error getting sound length: {e}")
-        return 0
+    return sound_bank.get_length(sound_path)
 
 def play_sound(sound_path):
     """Play a sound file"""
-    if not os.path.exists(sound_path):
-        print(f"Sound file not found: {sound_path}")
-        return
-        
     try:
-        sound = pygame.mixer.Sound(sound_path)
-        pygame.mixer.Sound.play(sound)
+        sound_bank.play(sound_path)
+    except FileNotFoundError:
+        print(f"Sound file not found: {sound_path}")
     except Exception as e:
-        print(f"Error playing sound: {e}")
\ No newline at end of file
+        print(f"Error playing sound: {e}")
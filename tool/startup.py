@@ -0,0 +1,67 @@
+import importlib
+import threading
+import time
+from tool.metrics import registry
+
+STARTUP_SECONDS = registry.gauge(
+    "cpr_startup_seconds", "Seconds from process start to each start-up milestone", ["phase"])
+IMPORT_SECONDS = registry.gauge(
+    "cpr_startup_import_seconds", "Time spent importing each deferred heavy module", ["module"])
+
+
+class StartupReport:
+    """
+    Milestones and deferred import times of one application start.
+
+    Times count from when this module was first imported, so run.py imports
+    it before anything else. mark() records a milestone such as the window
+    being interactive, timed_import() imports a module and records how long
+    it took; both also show up on /metrics.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.marks = {}  # phase -> seconds since origin, in the order reached
+        self.imports = {}  # module -> seconds the import took
+        self._lock = threading.Lock()
+        self.log_prefix = "Startup: "
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def mark(self, phase: str) -> float:
+        """Record that phase was reached now, the first call per phase counts"""
+        t = self.elapsed()
+        with self._lock:
+            if phase in self.marks:
+                return self.marks[phase]
+            self.marks[phase] = t
+        STARTUP_SECONDS.labels(phase).set(t)
+        print(self.log_prefix + f"{phase} at {1000 * t:.0f} ms")
+        return t
+
+    def timed_import(self, name: str):
+        """importlib.import_module that records the time of the first import"""
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        seconds = time.perf_counter() - start
+        with self._lock:
+            first = name not in self.imports
+            if first:
+                self.imports[name] = seconds
+        if first:
+            IMPORT_SECONDS.labels(name).set(seconds)
+        return module
+
+    def report(self) -> dict:
+        with self._lock:
+            return {"marks": dict(self.marks), "imports": dict(self.imports)}
+
+    def print_report(self):
+        report = self.report()
+        lines = [f"{phase:<32}{1000 * t:8.0f} ms" for phase, t in report["marks"].items()]
+        lines += [f"import {name:<25}{1000 * t:8.0f} ms" for name, t in report["imports"].items()]
+        print(self.log_prefix + "report\n    " + "\n    ".join(lines))
+
+
+startup = StartupReport()
@@ -0,0 +1,142 @@
+import itertools
+import os
+import threading
+import time
+
+
+class _NullSpan:
+    """Returned while tracing is off, entering and leaving it does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.start, time.perf_counter(), self.cat, self.args)
+        return False
+
+
+MAX_CAPACITY = 1 << 18  # events, a full ring of them is tens of MB on the Pi
+
+
+class Tracer:
+    """
+    Span recorder in the Chrome trace event format, off by default.
+
+    Events go into a ring buffer allocated up front, so a long session keeps
+    its newest events and memory stays fixed. Spans nest by time on each
+    thread; flows link a span on one thread, e.g. a loop step putting a
+    ui_queue message, to the span that handled it on another. While
+    disabled, span() returns a shared no-op and nothing is recorded.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        self.enabled = False
+        self._allocate(capacity)
+        self._thread_names = {}  # thread id -> name, kept for threads that exited
+        self._flow_ids = itertools.count(1)
+        self._origin = time.perf_counter()
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self._events = [None] * capacity
+        self._counter = itertools.count()  # next() is atomic under the GIL
+
+    def enable(self, capacity: int = None):
+        if capacity is not None and capacity != self.capacity:
+            self._allocate(capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self, capacity: int = None):
+        """Drop every event, resizing the ring to capacity if one is given"""
+        self._allocate(capacity if capacity is not None else self.capacity)
+
+    def span(self, name: str, cat: str = "", args: dict = None):
+        """Context manager recording how long its block took"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def _record(self, event: tuple):
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._events[next(self._counter) % self.capacity] = (tid,) + event
+
+    def complete(self, name: str, start: float, end: float, cat: str = "", args: dict = None):
+        """Span with perf_counter start and end times"""
+        if self.enabled:
+            self._record(("X", name, cat, start, end - start, args, None))
+
+    def instant(self, name: str, cat: str = "", args: dict = None):
+        if self.enabled:
+            self._record(("i", name, cat, time.perf_counter(), 0.0, args, None))
+
+    def flow_start(self, name: str, cat: str = ""):
+        """Start an arrow inside the current span, returns its id or None when off"""
+        if not self.enabled:
+            return None
+        flow_id = next(self._flow_ids)
+        self._record(("s", name, cat, time.perf_counter(), 0.0, None, flow_id))
+        return flow_id
+
+    def flow_end(self, flow_id, name: str, cat: str = ""):
+        """End the arrow inside the current span, call it within span()"""
+        if flow_id is not None and self.enabled:
+            self._record(("f", name, cat, time.perf_counter(), 0.0, None, flow_id))
+
+    def dump(self) -> dict:
+        """Buffered events as a Chrome trace / Perfetto JSON object"""
+        events = [e for e in list(self._events) if e is not None]
+        events.sort(key=lambda e: e[4])
+        pid = os.getpid()
+        trace = [
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._thread_names.items())
+        ]
+        for tid, ph, name, cat, ts, dur, args, flow_id in events:
+            event = {
+                "ph": ph, "name": name, "cat": cat or "default", "pid": pid, "tid": tid,
+                "ts": (ts - self._origin) * 1e6,
+            }
+            if ph == "X":
+                event["dur"] = dur * 1e6
+            elif ph == "i":
+                event["s"] = "t"
+            else:
+                event["id"] = flow_id
+                if ph == "f":
+                    event["bp"] = "e"
+            if args:
+                event["args"] = args
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+tracer = Tracer()
+# CPR_TRACE=1 records from start-up, otherwise enable at runtime via /trace/start
+if os.environ.get("CPR_TRACE", "") not in ("", "0"):
+    tracer.enable()
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import threading
+import time
+from tool.latest_value import LatestValue
+from tool.metrics import registry
+
+BOUNDARY = "frame"
+
+ENCODE_SECONDS = registry.histogram(
+    "camera_stream_encode_seconds", "JPEG encoding time per streamed frame",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+FRAMES_ENCODED = registry.counter("camera_stream_frames_encoded", "Frames encoded for /stream")
+FRAMES_DROPPED = registry.counter(
+    "camera_stream_frames_dropped", "Encoded frames a client was too slow to receive")
+LEVEL = registry.gauge("camera_stream_level", "Current quality level, 0 is the best")
+
+# (scale, JPEG quality) from best to cheapest, see CameraStream.adapt()
+LEVELS = (
+    (1.0, 80),
+    (1.0, 65),
+    (0.75, 65),
+    (0.75, 50),
+    (0.5, 50),
+    (0.5, 35),
+    (0.35, 35),
+)
+
+
+class CpuSampler:
+    """Share of the CPU left idle since the previous sample, whole system where /proc allows"""
+
+    def __init__(self):
+        self._last = self._read()
+
+    def _read(self) -> tuple[float, float]:
+        """(idle, total) seconds so far"""
+        try:
+            with open("/proc/stat") as f:
+                ticks = [int(v) for v in f.readline().split()[1:]]
+            return ticks[3] + ticks[4], sum(ticks[:8])  # idle + iowait, all but guest
+        except (OSError, ValueError, IndexError):
+            # This process only: wall time of every CPU minus what we used
+            wall = time.monotonic() * (os.cpu_count() or 1)
+            return wall - time.process_time(), wall
+
+    def idle_fraction(self) -> float:
+        idle, total = self._read()
+        last_idle, last_total = self._last
+        self._last = idle, total
+        if total <= last_total:
+            return 1.0
+        return max(0.0, min(1.0, (idle - last_idle) / (total - last_total)))
+
+
+class _Client:
+    __slots__ = ("ready", "pending", "dropped")
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.pending = None  # newest part not yet sent, replaced if the client lags
+        self.dropped = 0
+
+
+class CameraStream:
+    """
+    MJPEG broadcast of the annotated detector frames for /stream.
+
+    publish() only stores the newest frame. One encoder thread turns it
+    into a JPEG part at most max_fps times a second, and only while someone
+    watches; the same bytes go to every client. A client holds one pending
+    part, so one that reads slower than the stream skips frames instead of
+    queueing them. Every adapt_interval seconds the level (scale and
+    quality) steps down while CPU idle time is below min_headroom and back
+    up once it exceeds max_headroom.
+    """
+
+    def __init__(
+        self,
+        max_fps: float = 10.0,
+        min_headroom: float = 0.15,
+        max_headroom: float = 0.40,
+        adapt_interval: float = 2.0,
+        level: int = 1,
+    ):
+        self.max_fps = max_fps
+        self.min_headroom = min_headroom
+        self.max_headroom = max_headroom
+        self.adapt_interval = adapt_interval
+        self.level = level
+        LEVEL.set(level)
+
+        self.frames = LatestValue()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._clients = set()  # _Client per connection, only touched on the loop
+        self._thread = None
+        self._last_part = None  # shown to new clients right away
+        self._cpu = CpuSampler()
+
+        # Statistics
+        self.encoded = 0
+        self.dropped = 0
+        self.encode_seconds = 0.0  # spent since the last adapt()
+
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def publish(self, frame):
+        """Offer a BGR frame from any thread, never blocks"""
+        self.frames.publish(frame)
+
+    def get_stats(self) -> dict:
+        scale, quality = LEVELS[self.level]
+        return {
+            "clients": self.client_count(),
+            "encoded": self.encoded,
+            "dropped": self.dropped,
+            "level": self.level,
+            "scale": scale,
+            "quality": quality,
+        }
+
+    def _ensure_encoder(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._encode_loop, name="mjpeg", daemon=True)
+                self._thread.start()
+
+    def _encode_loop(self):
+        import cv2  # only once somebody watches, web start-up stays light
+
+        seq = 0
+        next_t = 0.0
+        next_adapt = time.monotonic() + self.adapt_interval
+        while True:
+            sample = self.frames.wait_newer(seq, timeout=1.0)
+            with self._lock:
+                if not self._clients:
+                    # Nobody watches: exit, _ensure_encoder starts a new thread for the next viewer
+                    self._thread = None
+                    return
+            now = time.monotonic()
+            if now >= next_adapt:
+                self.adapt(now - next_adapt + self.adapt_interval)
+                next_adapt = now + self.adapt_interval
+            if sample is None:
+                continue
+            if now < next_t:
+                time.sleep(next_t - now)
+                sample = self.frames.latest()  # the newest after the wait
+            seq = sample.seq
+            next_t = time.monotonic() + 1.0 / self.max_fps
+
+            start = time.perf_counter()
+            scale, quality = LEVELS[self.level]
+            image = sample.value
+            if scale != 1.0:
+                h, w = image.shape[:2]
+                image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                   interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", image, (cv2.IMWRITE_JPEG_QUALITY, quality))
+            if not ok:
+                continue
+            part = (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg.tobytes() + b"\r\n"
+            seconds = time.perf_counter() - start
+            ENCODE_SECONDS.observe(seconds)
+            FRAMES_ENCODED.inc()
+            self.encode_seconds += seconds
+            self.encoded += 1
+
+            self._last_part = part
+            try:
+                self._loop.call_soon_threadsafe(self._fan_out, part)
+            except RuntimeError:  # the server's loop is gone
+                pass
+
+    def adapt(self, elapsed: float):
+        """Step the level from the CPU idle share of the last elapsed seconds"""
+        idle = self._cpu.idle_fraction()
+        encode_share = self.encode_seconds / elapsed if elapsed > 0 else 0.0
+        self.encode_seconds = 0.0
+        level = self.level
+        if idle < self.min_headroom and level < len(LEVELS) - 1:
+            level += 1
+        elif idle > self.max_headroom and level > 0 and encode_share < idle / 2:
+            # Only if the next level's extra encoding still fits comfortably
+            level -= 1
+        if level != self.level:
+            print(f"Stream: CPU {100 * idle:.0f}% idle, encoding {100 * encode_share:.0f}%, "
+                  f"level {self.level} -> {level} {LEVELS[level]}")
+            self.level = level
+            LEVEL.set(level)
+
+    def _fan_out(self, part: bytes):
+        for client in self._clients:
+            if client.pending is not None:
+                client.dropped += 1
+                self.dropped += 1
+                FRAMES_DROPPED.inc()
+            client.pending = part
+            client.ready.set()
+
+    async def stream(self):
+        """multipart/x-mixed-replace body for one client"""
+        self._loop = asyncio.get_running_loop()
+        client = _Client()
+        self._clients.add(client)
+        self._ensure_encoder()
+        try:
+            if self._last_part is not None:
+                yield self._last_part
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                part, client.pending = client.pending, None
+                yield part
+        finally:
+            self._clients.discard(client)
@@ -1,14 +1,102 @@
+import datetime
+import json
+import os
+import threading
+from typing import NamedTuple, Optional
+
+class StatusSnapshot(NamedTuple):
+    """One immutable version of the machine record, serialized up front"""
+    version: int
+    electric_shocks: int
+    cpr_cycles: int
+    breathe: int
+    start_time: Optional[datetime.datetime]
+    body: bytes  # JSON served by /record
+    etag: str
+
+    def to_dict(self):
+        return {
+            "electric_shocks": self.electric_shocks,
+            "cpr_cycles": self.cpr_cycles,
+            "breathe": self.breathe,
+            "start_time": self.start_time
+        }
+
+def encode_json(data) -> bytes:
+    def default(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return json.dumps(data, default=default).encode()
+
 class CPRMachineStatus:
+    """
+    Machine record published as versioned snapshots.
+
+    Writers build a new StatusSnapshot and swap it in under a lock, readers
+    just take the current one, so nobody ever sees a half-updated record.
+    """
+
     def __init__(self):
-        self.electric_shocks = 0
-        self.cpr_cycles = 0
-        self.breathe = 0
-        self.start_time = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        # Tags must not repeat across restarts, or browsers would reuse old bodies
+        self._etag_prefix = os.urandom(4).hex()
+        self._snapshot = self._build(0, 0, 0, 0, None)
+
+    def _build(self, version, electric_shocks, cpr_cycles, breathe, start_time):
+        snapshot = StatusSnapshot(version, electric_shocks, cpr_cycles, breathe, start_time, b"", "")
+        return snapshot._replace(
+            body=encode_json(snapshot.to_dict()),
+            etag=f'"{self._etag_prefix}-{version}"',
+        )
+
+    def snapshot(self) -> StatusSnapshot:
+        return self._snapshot
+
+    @property
+    def electric_shocks(self):
+        return self._snapshot.electric_shocks
+
+    @property
+    def cpr_cycles(self):
+        return self._snapshot.cpr_cycles
+
+    @property
+    def breathe(self):
+        return self._snapshot.breathe
+
+    @property
+    def start_time(self):
+        return self._snapshot.start_time
 
     def update_status(self, shocks=0, cpr_cycles=0, ventilations=0):
-        self.electric_shocks += shocks
-        self.cpr_cycles += cpr_cycles
-        self.breathe += ventilations
+        with self._lock:
+            s = self._snapshot
+            self._snapshot = self._build(
+                s.version + 1,
+                s.electric_shocks + shocks,
+                s.cpr_cycles + cpr_cycles,
+                s.breathe + ventilations,
+                s.start_time,
+            )
+        self._changed()
 
     def set_start(self, start_time):
-        self.start_time = start_time
+        with self._lock:
+            s = self._snapshot
+            self._snapshot = self._build(
+                s.version + 1, s.electric_shocks, s.cpr_cycles, s.breathe, start_time
+            )
+        self._changed()
+
+    def to_dict(self):
+        return self._snapshot.to_dict()
+
+    def add_listener(self, listener):
+        """Call listener() after every change, from the thread that made it"""
+        self._listeners.append(listener)
+
+    def _changed(self):
+        for listener in self._listeners:
+            listener()
@@ -0,0 +1,214 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    event_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    t REAL NOT NULL,
+    kind TEXT NOT NULL,
+    step INTEGER,
+    detail TEXT,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+class SessionLog:
+    """
+    Append-only log of resuscitation sessions in SQLite.
+
+    Callers only put events on an in-memory queue; a writer thread inserts
+    them in batches, one transaction per batch, so the controller never
+    waits for the disk. Reads use their own connections, which WAL mode
+    lets run next to the writer. Both tables are keyed so every query is
+    an index range scan.
+    """
+
+    def __init__(self, path: str = "./sessions.db", batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._seq = {}  # session id -> last event seq
+        self._last_id = 0
+        self._thread = None
+
+        self.log_prefix = "  SL: "
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def start_session(self) -> int:
+        t = time.time()
+        with self._lock:
+            # Millisecond start time as id, unique and ordered by start
+            session_id = max(int(t * 1000), self._last_id + 1)
+            self._last_id = session_id
+            self._seq[session_id] = 0
+        self._ensure_writer()
+        self._queue.put(("start", session_id, t))
+        return session_id
+
+    def event(self, session_id: int, kind: str, step: int = None, detail=None):
+        """Record one event, never blocks"""
+        if session_id is None:
+            return
+        with self._lock:
+            seq = self._seq.get(session_id, 0) + 1
+            self._seq[session_id] = seq
+        if detail is not None:
+            detail = json.dumps(detail)
+        self._queue.put(("event", (session_id, seq, time.time(), kind, step, detail)))
+
+    def end_session(self, session_id: int):
+        if session_id is None:
+            return
+        with self._lock:
+            self._seq.pop(session_id, None)
+        self._queue.put(("end", session_id, time.time()))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far is committed"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(("close",))
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                running = self._write(conn, batch)
+            except sqlite3.Error as e:
+                print(self.log_prefix + f"Error writing session log: {e}")
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list) -> bool:
+        events = []
+        counts = {}
+        waiters = []
+        running = True
+        with conn:
+            for item in batch:
+                kind = item[0]
+                if kind == "event":
+                    events.append(item[1])
+                    counts[item[1][0]] = counts.get(item[1][0], 0) + 1
+                    continue
+                # Keep the order of starts, ends and the events around them
+                self._insert_events(conn, events, counts)
+                events, counts = [], {}
+                if kind == "start":
+                    conn.execute("INSERT OR IGNORE INTO sessions (id, started_at) VALUES (?, ?)", item[1:])
+                elif kind == "end":
+                    conn.execute("UPDATE sessions SET ended_at = ? WHERE id = ?", (item[2], item[1]))
+                elif kind == "flush":
+                    waiters.append(item[1])
+                elif kind == "close":
+                    running = False
+            self._insert_events(conn, events, counts)
+        for done in waiters:
+            done.set()
+        return running
+
+    def _insert_events(self, conn: sqlite3.Connection, events: list, counts: dict):
+        if not events:
+            return
+        conn.executemany(
+            "INSERT OR IGNORE INTO events (session_id, seq, t, kind, step, detail) VALUES (?, ?, ?, ?, ?, ?)",
+            events,
+        )
+        conn.executemany(
+            "UPDATE sessions SET event_count = event_count + ? WHERE id = ?",
+            [(count, session_id) for session_id, count in counts.items()],
+        )
+
+    def list_sessions(self, limit: int = 50, before: int = None) -> list:
+        """Newest sessions first, page with before=<smallest id seen>"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, started_at, ended_at, event_count FROM sessions"
+                " WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before if before is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+        except sqlite3.OperationalError:  # nothing written yet
+            return []
+        finally:
+            conn.close()
+        return [
+            {"id": r[0], "started_at": r[1], "ended_at": r[2], "event_count": r[3]}
+            for r in rows
+        ]
+
+    def get_session(self, session_id: int):
+        """One session's row, None if there is no such session"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT id, started_at, ended_at, event_count FROM sessions WHERE id = ?",
+                (session_id,),
+            ).fetchone()
+        except sqlite3.OperationalError:  # nothing written yet
+            return None
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"id": row[0], "started_at": row[1], "ended_at": row[2], "event_count": row[3]}
+
+    def timeline(self, session_id: int, after: int = 0, limit: int = 1000) -> list:
+        """Events of one session in order, page with after=<last seq seen>"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT seq, t, kind, step, detail FROM events"
+                " WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (session_id, after, limit),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        finally:
+            conn.close()
+        return [
+            {"seq": r[0], "t": r[1], "kind": r[2], "step": r[3],
+             "detail": json.loads(r[4]) if r[4] is not None else None}
+            for r in rows
+        ]
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from website.machine_stat import encode_json
+
+def encode(data: dict) -> bytes:
+    """One Server-Sent Events message carrying data as JSON"""
+    return event(encode_json(data))
+
+def event(body: bytes) -> bytes:
+    return b"data: " + body + b"\n\n"
+
+class StatusBroadcaster:
+    """
+    Pushes CPRMachineStatus changes to Server-Sent Events subscribers.
+
+    Every change is turned into a delta of the fields that changed and
+    serialized once; the same bytes are queued for every subscriber. Deltas
+    carry absolute values, so a subscriber that falls behind is simply
+    reset to a full snapshot instead of buffering without bound.
+    """
+
+    def __init__(self, status, queue_size: int = 8, keepalive: float = 15.0):
+        self.status = status
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+
+        self._lock = threading.Lock()
+        self._last = status.snapshot()
+        self._loop = None
+        self._subscribers = set()  # asyncio.Queue per client, only touched on the loop
+
+        # Statistics
+        self.published = 0
+        self.resyncs = 0
+
+        status.add_listener(self.publish)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def snapshot(self) -> bytes:
+        with self._lock:
+            return event(self._last.body)
+
+    def publish(self):
+        """Called from any thread after the status changed"""
+        with self._lock:
+            snapshot = self.status.snapshot()
+            if snapshot.version <= self._last.version:
+                return
+            last = self._last.to_dict()
+            delta = {key: value for key, value in snapshot.to_dict().items() if last[key] != value}
+            self._last = snapshot
+            loop = self._loop
+        if not delta or loop is None:  # unchanged, or nobody has subscribed yet
+            return
+        payload = encode(delta)
+        try:
+            loop.call_soon_threadsafe(self._fan_out, payload)
+        except RuntimeError:  # the server's loop is gone
+            pass
+
+    def _fan_out(self, payload: bytes):
+        self.published += 1
+        resync = None
+        for queue in self._subscribers:
+            if queue.full():
+                # Slow consumer: throw away what it has not read yet and
+                # let it catch up with the full state in one message
+                while not queue.empty():
+                    queue.get_nowait()
+                if resync is None:
+                    resync = self.snapshot()
+                queue.put_nowait(resync)
+                self.resyncs += 1
+            else:
+                queue.put_nowait(payload)
+
+    async def stream(self):
+        """SSE chunks for one subscriber, starting with the full state"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield self.snapshot()
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self._subscribers.discard(queue)
@@ -1,23 +1,26 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+import gzip
+import hashlib
+import time
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from website.machine_stat import CPRMachineStatus
+from website.status_stream import StatusBroadcaster
+from website.camera_stream import CameraStream, BOUNDARY
+from website.session_log import SessionLog
+from tool.metrics import registry, CONTENT_TYPE
+from tool.trace import tracer, MAX_CAPACITY as MAX_TRACE_CAPACITY
 
 app = FastAPI()
 machine_status = CPRMachineStatus()
-# m`+achine_status.update_status(shocks=2, cpr_cycles=2, ventilations=2)
+status_stream = StatusBroadcaster(machine_status)
+camera_stream = CameraStream()
+session_log = SessionLog()
 
-@app.get("/record")
-def get_status():
-    return {
-        "electric_shocks": machine_status.electric_shocks,
-        "cpr_cycles": machine_status.cpr_cycles,
-        "breathe": machine_status.breathe,
-        "start_time": machine_status.start_time
-    }
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Request to response start, by route", ["route", "method"])
+# m`+achine_status.update_status(shocks=2, cpr_cycles=2, ventilations=2)
 
-@app.get("/", response_class=HTMLResponse)
-def index():
-    html_content = """
+INDEX_HTML = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -61,6 +64,32 @@ def index():
         let startTime = null;
         let runTimeInterval = null;
 
+        // Apply a full record or a delta holding only the changed fields
+        function applyStatus(data) {
+            if ('electric_shocks' in data) {
+                document.getElementById('electricShocks').innerText = data.electric_shocks;
+            }
+            if ('cpr_cycles' in data) {
+                document.getElementById('cprCycles').innerText = data.cpr_cycles;
+            }
+            if ('breathe' in data) {
+                document.getElementById('breathe').innerText = data.breathe;
+            }
+            if (!('start_time' in data)) {
+                return;
+            }
+
+            clearInterval(runTimeInterval);
+            if (data.start_time === null) {
+                startTime = null;
+                document.getElementById('runTime').innerText = "Not started";
+            } else {
+                startTime = new Date(data.start_time);
+                updateRunTime();
+                runTimeInterval = setInterval(updateRunTime, 1000);
+            }
+        }
+
         async function fetchStatus() {
             try {
                 const response = await fetch('/record');
@@ -68,19 +97,10 @@ def index():
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
                 const data = await response.json();
-                document.getElementById('electricShocks').innerText = data.electric_shocks;
-                document.getElementById('cprCycles').innerText = data.cpr_cycles;
-                document.getElementById('breathe').innerText = data.breathe;
-
-                if (data.start_time === null) {
-                    startTime = null;
-                    clearInterval(runTimeInterval);
-                    document.getElementById('runTime').innerText = "Not started";
-                } else if (!startTime) {
-                    startTime = new Date(data.start_time);
-                    updateRunTime();
-                    runTimeInterval = setInterval(updateRunTime, 1000);
+                if (data.start_time !== null && startTime && new Date(data.start_time).getTime() === startTime.getTime()) {
+                    delete data.start_time;  // keep the running timer
                 }
+                applyStatus(data);
             } catch (error) {
                 console.error('Error fetching record:', error);
             }
@@ -103,13 +123,19 @@ def index():
             elements.forEach(el => el.innerText = 'Loading...');
         }
 
-        // Fetch record every second
-        setInterval(fetchStatus, 1000);
-
-        // Fetch record on page load
         window.onload = () => {
             showLoadingAnimation();
-            fetchStatus();
+
+            if (window.EventSource) {
+                // The server pushes changes; EventSource reconnects by itself
+                // and the first message after connecting is the full record
+                const source = new EventSource('/events');
+                source.onmessage = (event) => applyStatus(JSON.parse(event.data));
+            } else {
+                // Fetch record every second
+                fetchStatus();
+                setInterval(fetchStatus, 1000);
+            }
         };
     </script>
 </head>
@@ -121,11 +147,111 @@ def index():
         <p><strong>Breathe:</strong> <span id="breathe">Loading...</span></p>
         <p><strong>Run Time:</strong> <span id="runTime">Not started</span></p>
     </div>
+    <div>
+        <img src="/stream" alt="Camera, shown while the machine aligns it" style="max-width: 100%;">
+    </div>
 </body>
 </html>
 
-    """
-    return HTMLResponse(content=html_content)
+"""
+# Compressed and tagged once at import, the page never changes at runtime
+INDEX_HTML_GZIP = gzip.compress(INDEX_HTML.encode(), compresslevel=9)
+INDEX_ETAG = '"' + hashlib.sha1(INDEX_HTML.encode()).hexdigest()[:16] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client already holds this version (If-None-Match)"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags or "*" in tags
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, so the label set stays small
+    route = request.scope.get("route")
+    path = route.path if route is not None else "other"
+    HTTP_SECONDS.labels(path, request.method).observe(time.perf_counter() - start)
+    return response
+
+@app.get("/record")
+async def get_status(request: Request):
+    # The snapshot carries its JSON body and tag, nothing is built per poll
+    snapshot = machine_status.snapshot()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(snapshot.body, media_type="application/json", headers=headers)
+
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request):
+    headers = {"ETag": INDEX_ETAG, "Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+    if etag_matches(request, INDEX_ETAG):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(INDEX_HTML_GZIP, media_type="text/html", headers=headers)
+    return HTMLResponse(content=INDEX_HTML, headers=headers)
+
+@app.get("/events")
+def events():
+    """Server-Sent Events: the full record first, then only the fields that change"""
+    return StreamingResponse(
+        status_stream.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stream")
+def stream():
+    """MJPEG of the annotated camera frames while the machine aligns the camera"""
+    return StreamingResponse(
+        camera_stream.stream(),
+        media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+        headers={"Cache-Control": "no-cache, private", "Pragma": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/metrics")
+def metrics():
+    """Every subsystem's metrics in the Prometheus text format"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/trace")
+def get_trace():
+    """Recorded spans as Chrome trace JSON, open in Perfetto or chrome://tracing"""
+    return JSONResponse(
+        tracer.dump(),
+        headers={"Content-Disposition": 'attachment; filename="trace.json"'},
+    )
+
+@app.post("/trace/start")
+def start_trace(capacity: int = None, clear: bool = True):
+    if capacity is not None and not 1 <= capacity <= MAX_TRACE_CAPACITY:
+        raise HTTPException(status_code=422, detail=f"capacity must be 1 to {MAX_TRACE_CAPACITY}")
+    if clear:
+        tracer.clear(capacity)  # one allocation, enable() then keeps it
+    tracer.enable(capacity)
+    return {"enabled": True, "capacity": tracer.capacity}
+
+@app.post("/trace/stop")
+def stop_trace():
+    tracer.disable()
+    return {"enabled": False, "capacity": tracer.capacity}
+
+@app.get("/sessions")
+def list_sessions(limit: int = 50, before: int = None):
+    """Newest sessions first; pass the last id as before= for the next page"""
+    return session_log.list_sessions(min(max(limit, 1), 500), before)
+
+@app.get("/sessions/{session_id}")
+def session_timeline(session_id: int, after: int = 0, limit: int = 1000):
+    """Events of one session; pass the last seq as after= for the next page"""
+    if session_log.get_session(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    events = session_log.timeline(session_id, after, min(max(limit, 1), 5000))
+    return {"id": session_id, "events": events}
 
 if __name__ == "__main__":
     import uvicorn